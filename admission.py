@@ -0,0 +1,184 @@
+import os
+import re
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Route classes by method and path, first match wins. Cheap indexed reads,
+# scans (lists, rosters, searches, exports) and writes get separate budgets so
+# a burst of scans cannot starve by-id and by-name reads. Health and metrics
+# are never limited so probes keep answering under overload.
+ROUTE_CLASSES = [
+    ("exempt", None, re.compile(r"^/(health/|metrics$|cache/stats$|docs|openapi\.json$)")),
+    ("read", {"GET", "HEAD"}, re.compile(r"^/[^/]+/one[A-Za-z]*/[^/]+$|/autocomplete$|^/views/[^/]+/[^/]+$")),
+    # Fixed paths that would otherwise look like /<collection>/{name}
+    ("scan", {"GET", "HEAD"}, re.compile(
+        r"^/(scientists|patents)/(export|search|co-contributors)$|^/courses/students$|^/universities/carreras$")),
+    ("read", {"GET", "HEAD"}, re.compile(r"^/(students|courses|universities|scientists|patents)/[^/]+$")),
+    ("read", {"POST"}, re.compile(r"/batch-get$")),
+    ("scan", {"POST"}, re.compile(r"/query$")),
+    ("scan", {"GET", "HEAD"}, re.compile(r"")),
+    ("write", None, re.compile(r"")),
+]
+
+# class -> (concurrent requests, queued requests, max queue wait in ms). The
+# concurrency budgets together should stay below the Mongo maxPoolSize (100
+# by default) so admitted requests do not wait for connections.
+DEFAULT_BUDGETS = {
+    "read": (48, 192, 50),
+    "scan": (8, 32, 500),
+    "write": (16, 64, 200),
+}
+
+
+def classify(method, path):
+    for name, methods, pattern in ROUTE_CLASSES:
+        if (methods is None or method in methods) and pattern.search(path):
+            return name
+    return "write"
+
+
+class Rejected(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+
+# Token budget for one route class with a bounded FIFO wait queue. A request
+# is rejected right away when the queue is full or when the expected wait
+# (queue length times the recent service time over the budget) is past the
+# target, and rejected later if it is still queued at its deadline.
+class Limiter:
+    def __init__(self, name, limit, queue_size, max_wait):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiters = deque()
+        self.service_time = 0.0  # moving average of the time a token is held
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def expected_wait(self):
+        return (len(self.waiters) + 1) * self.service_time / self.limit
+
+    def retry_after(self):
+        return max(1, math.ceil(self.expected_wait()))
+
+    async def acquire(self):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.queue_size or self.expected_wait() > self.max_wait:
+            self.rejected += 1
+            raise Rejected(self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self.waiters.append(waiter)
+        timer = loop.call_later(self.max_wait, self._expire, waiter)
+        try:
+            await waiter
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Rejected(self.retry_after())
+        except asyncio.CancelledError:
+            # The client went away; give back a token that was already handed over
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release(0.0)
+            raise
+        finally:
+            timer.cancel()
+        self.admitted += 1
+
+    def _expire(self, waiter):
+        if not waiter.done():
+            self.waiters.remove(waiter)
+            waiter.set_exception(asyncio.TimeoutError())
+
+    def release(self, held):
+        if held:
+            self.service_time = held if not self.service_time else 0.9 * self.service_time + 0.1 * held
+        # Hand the token straight to the oldest waiter
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "service_time_ms": round(self.service_time * 1000, 3),
+        }
+
+
+def limiters_from_env():
+# ADMISSION_<CLASS>_LIMIT, ADMISSION_<CLASS>_QUEUE and ADMISSION_<CLASS>_MAX_WAIT_MS
+    limiters = {}
+    for name, (limit, queue_size, max_wait) in DEFAULT_BUDGETS.items():
+        prefix = f"ADMISSION_{name.upper()}"
+        limiters[name] = Limiter(
+            name,
+            int(os.getenv(f"{prefix}_LIMIT", limit)),
+            int(os.getenv(f"{prefix}_QUEUE", queue_size)),
+            float(os.getenv(f"{prefix}_MAX_WAIT_MS", max_wait)) / 1000,
+        )
+    return limiters
+
+
+# Pure ASGI middleware that admits each request into its class budget or
+# sheds it with 503 and Retry-After. The token is held until the response,
+# including a streamed body, has been sent.
+class AdmissionMiddleware:
+    def __init__(self, app, limiters=None):
+        self.app = app
+        self.limiters = limiters if limiters is not None else limiters_from_env()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limiter = self.limiters.get(classify(scope["method"], scope["path"]))
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limiter.acquire()
+        except Rejected as e:
+            logger.info("Shedding %s %s (%s budget full)", scope["method"], scope["path"], limiter.name)
+            await _service_unavailable(send, e.retry_after)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+async def _service_unavailable(send, retry_after):
+    body = b'{"detail":"Service overloaded, retry later"}'
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+logger = logging.getLogger(__name__)
+
+
+# Group commit for inserts: documents queued by concurrent callers are
+# written with one unordered insert_many when max_docs are waiting or
+# max_delay seconds after the first one arrived, whichever comes first.
+# Each caller gets its own inserted _id or its own write error back.
+class InsertBatcher:
+    def __init__(self, collection, max_docs=100, max_delay=0.005):
+        self.collection = collection
+        self.max_docs = max_docs
+        self.max_delay = max_delay
+        self._pending = []  # (doc, future)
+        self._timer = None
+        self._writes = set()
+        self.batches = 0
+        self.documents = 0
+
+    async def insert(self, doc):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_docs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            write = asyncio.ensure_future(self._write(batch))
+            self._writes.add(write)
+            write.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch):
+        docs = [doc for doc, _ in batch]
+        self.batches += 1
+        self.documents += len(docs)
+        failed = {}
+        try:
+            # insert_many sets _id on every document before sending them
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details["writeErrors"]}
+        except Exception as e:
+            logger.error("Batched insert of %s documents into %s failed: %s", len(docs), self.collection.name, e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for index, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            error = failed.get(index)
+            if error is None:
+                future.set_result(doc["_id"])
+            elif error.get("code") == 11000:
+                future.set_exception(DuplicateKeyError(error["errmsg"], error["code"], error))
+            else:
+                future.set_exception(WriteError(error["errmsg"], error.get("code"), error))
+
+    async def close(self):
+        # Write whatever is queued and wait for writes in progress
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "documents": self.documents,
+        }
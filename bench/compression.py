@@ -0,0 +1,67 @@
+# Benchmark de compresion de respuestas contra una instancia en marcha de la API.
+#
+# Pide los listados grandes con cada Accept-Encoding y muestra los bytes que
+# viajan por la red y la latencia. Para medir la compresion del protocolo de
+# Mongo se arranca el servidor con MONGO_COMPRESSORS=none y con el valor por
+# defecto y se comparan las latencias:
+#
+#   uvicorn main:app
+#   python bench/compression.py --paths /students,/courses,/courses/<id>/students
+#
+# Requiere httpx (pip install httpx).
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+ENCODINGS = ("identity", "gzip", "br", "zstd")
+
+
+async def measure(client, path, encoding, repeat):
+    sizes = []
+    latencies = []
+    applied = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        async with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+            size = 0
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+            applied = response.headers.get("content-encoding", "identity")
+        latencies.append(time.perf_counter() - start)
+        sizes.append(size)
+    return {
+        "encoding": applied,
+        "bytes": statistics.median(sizes),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--paths", default="/students,/courses")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        for path in args.paths.split(","):
+            identity = None
+            for encoding in ENCODINGS:
+                result = await measure(client, path, encoding, args.repeat)
+                if result["encoding"] != encoding:
+                    # El servidor no tiene ese compresor instalado
+                    continue
+                identity = identity or result["bytes"]
+                print(
+                    f"{path:<40} {encoding:<8} bytes={result['bytes']:>10.0f}  "
+                    f"ratio={identity / max(result['bytes'], 1):>5.1f}x  "
+                    f"p50={result['p50_ms']:>8.2f}ms  max={result['max_ms']:>8.2f}ms"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
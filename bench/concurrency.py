@@ -0,0 +1,76 @@
+# Benchmark de concurrencia contra una instancia en marcha de la API.
+#
+# Lanza el mismo GET con distintos niveles de concurrencia y muestra
+# throughput y latencias. Para comparar antes/despues se ejecuta contra el
+# servidor levantado en cada commit:
+#
+#   uvicorn main:app --workers 1
+#   python bench/concurrency.py --path /students/oneStudentbyId/<id>
+#
+# Requiere httpx (pip install httpx).
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run_level(client, path, concurrency, total):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/students")
+    parser.add_argument("--levels", default="1,10,50,100,500")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        for level in (int(x) for x in args.levels.split(",")):
+            result = await run_level(client, args.path, level, args.requests)
+            print(
+                f"c={result['concurrency']:>4}  rps={result['rps']:>9.1f}  "
+                f"p50={result['p50_ms']:>8.2f}ms  p99={result['p99_ms']:>8.2f}ms  "
+                f"errors={result['errors']}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,445 @@
+# Harness de benchmarks de todos los endpoints.
+#
+#   python bench/harness.py seed --scale 1 --drop          # datos sinteticos en el mongod local
+#   python bench/harness.py generate --out bench/mix.jsonl # mezcla de peticiones con ids reales
+#   python bench/harness.py run --requests bench/mix.jsonl --levels 1,16,64 --output results.json
+#   python bench/harness.py compare before.json after.json
+#
+# Cada linea del JSONL es una peticion:
+#   {"endpoint": "GET /students/oneStudentbyId/{id}", "method": "GET",
+#    "path": "/students/oneStudentbyId/665f...", "params": {}, "body": null}
+# El mismo formato lo escribe la grabacion de trafico real, asi que se pueden
+# reproducir peticiones grabadas o generadas. run mide cada nivel de
+# concurrencia por separado y escribe JSON con throughput y p50/p95/p99 por
+# endpoint, para comparar resultados entre commits.
+#
+# Usa MONGO_URI (por defecto un mongod local) y la base de datos "test", la
+# misma que la API. Requiere httpx (pip install httpx).
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+
+DATABASE = "test"
+
+# Documentos por coleccion con --scale 1
+BASE_COUNTS = {
+    "students": 10_000,
+    "courses": 500,
+    "universities": 50,
+    "scientists": 10_000,
+    "patents": 20_000,
+}
+INSERT_BATCH = 5000
+
+FIRST_NAMES = ["Lucia", "Hugo", "Martina", "Mateo", "Sofia", "Leo", "Julia", "Daniel", "Paula", "Alvaro",
+               "Carmen", "Pablo", "Elena", "Manuel", "Sara", "Javier", "Ana", "Diego", "Marta", "Adrian"]
+LAST_NAMES = ["Garcia", "Rodriguez", "Gonzalez", "Fernandez", "Lopez", "Martinez", "Sanchez", "Perez",
+              "Gomez", "Martin", "Jimenez", "Ruiz", "Hernandez", "Diaz", "Moreno", "Munoz", "Alvarez", "Romero"]
+FACULTIES = ["Ciencias", "Ingenieria", "Medicina", "Derecho", "Economia", "Humanidades"]
+FIELDS = ["Matematicas", "Fisica", "Quimica", "Biologia", "Ingenieria", "Medicina", "Economia", "Derecho"]
+CATEGORIES = ["Catedratico", "Titular", "Contratado", "Investigador"]
+WORDS = ("metodo sistema dispositivo procedimiento compuesto sensor energia datos red celula proteina "
+         "material control medida analisis sintesis optico termico movil senal").split()
+
+
+def person(rng, i):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+
+
+def documents(rng, counts):
+# Generar los documentos de todas las colecciones con ids ya asignados
+    students = [
+        {"_id": ObjectId(), "name": person(rng, i), "age": rng.randint(18, 30), "version": 1}
+        for i in range(counts["students"])
+    ]
+    courses = [
+        {
+            "_id": ObjectId(),
+            "name": f"Curso {i}",
+            "facultad": rng.choice(FACULTIES),
+            "alumnos": [str(s["_id"]) for s in rng.sample(students, min(len(students), rng.randint(20, 60)))],
+            "version": 1,
+        }
+        for i in range(counts["courses"])
+    ]
+    universities = [
+        {
+            "_id": ObjectId(),
+            "name": f"Universidad {i}",
+            "carreras": [str(c["_id"]) for c in rng.sample(courses, min(len(courses), rng.randint(5, 20)))],
+            "version": 1,
+        }
+        for i in range(counts["universities"])
+    ]
+    scientists = []
+    for i in range(counts["scientists"]):
+        name = person(rng, i)
+        affiliations = rng.sample(universities, min(len(universities), rng.randint(1, 2)))
+        scientists.append({
+            "_id": ObjectId(),
+            "name": name,
+            "email": f"{name.lower().replace(' ', '.')}@example.org",
+            "category": rng.choice(CATEGORIES),
+            "cneaiField": rng.choice(FIELDS),
+            # Unas afiliaciones guardan el id de la universidad y otras el nombre
+            "universities": [str(u["_id"]) if rng.random() < 0.5 else u["name"] for u in affiliations],
+            "version": 1,
+        })
+    patents = []
+    for i in range(counts["patents"]):
+        # Contribuidores cercanos entre si para que el grafo tenga comunidades
+        center = rng.randrange(len(scientists))
+        team = {scientists[(center + rng.randint(-20, 20)) % len(scientists)]["name"] for _ in range(rng.randint(1, 5))}
+        patents.append({
+            "_id": ObjectId(),
+            "name": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}",
+            "contributors": sorted(team),
+            "date": f"{rng.randint(1990, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "uri": f"urn:patent:{i}",
+            "url": f"https://example.org/patents/{i}",
+            "summary": " ".join(rng.choice(WORDS) for _ in range(40)),
+            "version": 1,
+        })
+    return {"students": students, "courses": courses, "universities": universities,
+            "scientists": scientists, "patents": patents}
+
+
+async def seed(args):
+    counts = {name: max(1, int(count * args.scale)) for name, count in BASE_COUNTS.items()}
+    client = AsyncMongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = client[DATABASE]
+    try:
+        for name, docs in documents(random.Random(args.seed), counts).items():
+            if args.drop:
+                await db[name].drop()
+            start = time.perf_counter()
+            for i in range(0, len(docs), INSERT_BATCH):
+                await db[name].insert_many(docs[i:i + INSERT_BATCH], ordered=False)
+            print(f"{name:<14} {len(docs):>9} docs  {time.perf_counter() - start:>6.2f}s", file=sys.stderr)
+    finally:
+        await client.close()
+
+
+async def sample(db, collection, size, fields):
+    cursor = await db[collection].aggregate([{"$sample": {"size": size}}, {"$project": fields}])
+    return await cursor.to_list(None)
+
+
+def request(endpoint, path, params=None, body=None):
+    method = endpoint.split(" ", 1)[0]
+    return {"endpoint": endpoint, "method": method, "path": path, "params": params or {}, "body": body}
+
+
+#cuerpos de creacion de cada coleccion; las referencias apuntan a documentos muestreados
+def student_body(d, r):
+    return {"name": person(r, r.randrange(10**6)), "age": r.randint(18, 30)}
+
+
+def course_body(d, r):
+    return {"name": f"Curso bench {r.randrange(10**6)}", "facultad": r.choice(FACULTIES),
+            "alumnos": [student_body(d, r) for _ in range(r.randint(1, 5))]}
+
+
+def university_body(d, r):
+    return {"name": f"Universidad bench {r.randrange(10**6)}",
+            "carreras": [str(c["_id"]) for c in r.sample(d["courses"], min(len(d["courses"]), 5))]}
+
+
+def scientist_body(d, r):
+    return {"name": person(r, r.randrange(10**6)), "email": "bench@example.org", "category": r.choice(CATEGORIES),
+            "cneaiField": r.choice(FIELDS), "universities": [str(r.choice(d["universities"])["_id"])]}
+
+
+def patent_body(d, r):
+    return {"name": f"Bench {r.randrange(10**6)}", "contributors": [r.choice(d["scientists"])["name"]],
+            "date": "2024-01-01", "uri": "urn:bench", "url": "https://example.org/bench", "summary": "bench"}
+
+
+BODIES = {"students": student_body, "courses": course_body, "universities": university_body,
+          "scientists": scientist_body, "patents": patent_body}
+# Segmento de las rutas por id de cada coleccion: oneStudentbyId, updateCourse, ...
+SINGULAR = {"students": "Student", "courses": "Course", "universities": "University",
+            "scientists": "Scientist", "patents": "Patent"}
+
+
+def batch_get(collection):
+    return (2, lambda d, r: request(f"POST /{collection}/batch-get", f"/{collection}/batch-get",
+                                    body=[str(doc["_id"]) for doc in r.sample(d[collection], min(len(d[collection]), 50))]))
+
+
+def bulk(collection):
+    # Lotes pequenos: miden la carga masiva sin hacer crecer mucho la coleccion
+    return (1, lambda d, r: request(f"POST /{collection}/bulk", f"/{collection}/bulk",
+                                    body=[BODIES[collection](d, r) for _ in range(20)]))
+
+
+def writes(collection):
+# Alta, modificacion y borrado; las dos ultimas van a ids nuevos (404) para no
+# tocar los documentos muestreados
+    singular = SINGULAR[collection]
+    return [
+        (1, lambda d, r: request(f"POST /{collection}", f"/{collection}", body=BODIES[collection](d, r))),
+        (1, lambda d, r: request(f"PUT /{collection}/update{singular}/{{id}}", f"/{collection}/update{singular}/{ObjectId()}",
+                                 body=BODIES[collection](d, r))),
+        (1, lambda d, r: request(f"DELETE /{collection}/delete{singular}/{{id}}", f"/{collection}/delete{singular}/{ObjectId()}")),
+    ]
+
+
+# (peso, generador) de cada endpoint; los generadores reciben los documentos
+# muestreados y devuelven una peticion. Las escrituras no borran ni cambian
+# los documentos muestreados para que la mezcla se pueda repetir. Cubre todas
+# las rutas de la API salvo la documentacion (/docs, /openapi.json).
+MIX = [
+    (20, lambda d, r: request("GET /students/oneStudentbyId/{id}", f"/students/oneStudentbyId/{r.choice(d['students'])['_id']}")),
+    (5, lambda d, r: request("GET /students/oneStudent/{name}", f"/students/oneStudent/{r.choice(d['students'])['name']}")),
+    (5, lambda d, r: request("GET /students/{name}", f"/students/{r.choice(d['students'])['name']}")),
+    (3, lambda d, r: request("GET /students", "/students", {"limit": 100})),
+    (3, lambda d, r: request("POST /students/query", "/students/query", body={
+        "filters": [{"field": "age", "op": "gte", "value": 20}, {"field": "age", "op": "lt", "value": 23}],
+        "sort": [{"field": "age", "direction": 1}], "limit": 100})),
+    (3, lambda d, r: request("GET /courses", "/courses", {"limit": 100})),
+    (8, lambda d, r: request("GET /courses/oneCourse/{id}", f"/courses/oneCourse/{r.choice(d['courses'])['_id']}")),
+    (3, lambda d, r: request("GET /courses/{name}", f"/courses/{r.choice(d['courses'])['name']}")),
+    (5, lambda d, r: request("GET /courses/{course_id}/students", f"/courses/{r.choice(d['courses'])['_id']}/students")),
+    (2, lambda d, r: request("GET /courses/students", "/courses/students",
+                             {"ids": ",".join(str(c["_id"]) for c in r.sample(d["courses"], min(len(d["courses"]), 5)))})),
+    (2, lambda d, r: request("POST /courses/query", "/courses/query", body={
+        "filters": [{"field": "facultad", "op": "eq", "value": r.choice(FACULTIES)}], "limit": 100})),
+    # Curso nuevo (404) tras comprobar estudiantes reales: no cambia los cursos muestreados
+    (1, lambda d, r: request("PUT /courses/{course_id}/add_student_ids", f"/courses/{ObjectId()}/add_student_ids",
+                             body=[str(s["_id"]) for s in r.sample(d["students"], min(len(d["students"]), 5))])),
+    (5, lambda d, r: request("GET /universities/oneUniversity/{id}",
+                             f"/universities/oneUniversity/{r.choice(d['universities'])['_id']}")),
+    (2, lambda d, r: request("GET /universities/{name}", f"/universities/{r.choice(d['universities'])['name']}")),
+    (3, lambda d, r: request("GET /universities/{university_id}/carreras",
+                             f"/universities/{r.choice(d['universities'])['_id']}/carreras")),
+    (2, lambda d, r: request("GET /universities/carreras", "/universities/carreras",
+                             {"ids": ",".join(str(u["_id"]) for u in r.sample(d["universities"], min(len(d["universities"]), 3)))})),
+    (2, lambda d, r: request("GET /universities/{university_id}/network",
+                             f"/universities/{r.choice(d['universities'])['_id']}/network", {"limit": 50})),
+    (2, lambda d, r: request("POST /universities/query", "/universities/query", body={
+        "filters": [{"field": "name", "op": "gte", "value": "Universidad 1"}],
+        "sort": [{"field": "name", "direction": 1}], "limit": 20})),
+    # Universidad nueva (404): no cambia las universidades muestreadas
+    (1, lambda d, r: request("PUT /universities/{university_id}/add", f"/universities/{ObjectId()}/add",
+                             body=[str(r.choice(d["courses"])["_id"])])),
+    (10, lambda d, r: request("GET /scientists/oneScientist/{id}", f"/scientists/oneScientist/{r.choice(d['scientists'])['_id']}")),
+    (3, lambda d, r: request("GET /scientists/{name}", f"/scientists/{r.choice(d['scientists'])['name']}")),
+    (3, lambda d, r: request("GET /scientists/search", "/scientists/search", {"q": r.choice(FIELDS)})),
+    (3, lambda d, r: request("GET /scientists/autocomplete", "/scientists/autocomplete",
+                             {"prefix": r.choice(d['scientists'])['name'][:3]})),
+    (2, lambda d, r: request("GET /scientists/co-contributors", "/scientists/co-contributors",
+                             {"name": r.choice(d['scientists'])['name'], "depth": r.randint(1, 2)})),
+    (2, lambda d, r: request("POST /scientists/query", "/scientists/query", body={
+        "filters": [{"field": "cneaiField", "op": "eq", "value": r.choice(FIELDS)},
+                    {"field": "category", "op": "eq", "value": r.choice(CATEGORIES)}], "limit": 100})),
+    (1, lambda d, r: request("GET /scientists/export", "/scientists/export",
+                             {"filter": json.dumps({"cneaiField": r.choice(FIELDS)}), "fields": "name,email"})),
+    (10, lambda d, r: request("GET /patents/onePatent/{id}", f"/patents/onePatent/{r.choice(d['patents'])['_id']}")),
+    (3, lambda d, r: request("GET /patents/{name}", f"/patents/{r.choice(d['patents'])['name']}")),
+    (3, lambda d, r: request("GET /patents/search", "/patents/search", {"q": r.choice(WORDS)})),
+    (2, lambda d, r: request("GET /patents/autocomplete", "/patents/autocomplete", {"prefix": r.choice(WORDS)[:3]})),
+    (2, lambda d, r: request("POST /patents/query", "/patents/query", body={
+        "filters": [{"field": "date", "op": "gte", "value": f"{r.randint(1990, 2024)}"}],
+        "sort": [{"field": "date", "direction": 1}], "limit": 100})),
+    (1, lambda d, r: request("GET /patents/export", "/patents/export",
+                             {"filter": json.dumps({"date": {"$gte": f"{r.randint(2020, 2024)}"}}), "fields": "name,date"})),
+    (1, lambda d, r: request("GET /views/{view}", "/views/scientists_per_field")),
+    (1, lambda d, r: request("GET /views/{view}/{key}", f"/views/students_per_course/{r.choice(d['courses'])['_id']}")),
+    (1, lambda d, r: request("GET /views/{view}/{key}", f"/views/scientists_per_field/{r.choice(FIELDS)}")),
+    (1, lambda d, r: request("GET /views/{view}/{key}", f"/views/patents_per_year/{r.randint(1990, 2024)}")),
+    (1, lambda d, r: request("GET /health/ready", "/health/ready")),
+    (1, lambda d, r: request("GET /health/live", "/health/live")),
+    (1, lambda d, r: request("GET /metrics", "/metrics")),
+    (1, lambda d, r: request("GET /cache/stats", "/cache/stats")),
+]
+for _collection in BODIES:
+    MIX += [batch_get(_collection), bulk(_collection), *writes(_collection)]
+
+
+async def generate(args):
+    client = AsyncMongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = client[DATABASE]
+    try:
+        sampled = {
+            collection: await sample(db, collection, args.sample, {"name": 1})
+            for collection in BASE_COUNTS
+        }
+    finally:
+        await client.close()
+    empty = [collection for collection, docs in sampled.items() if not docs]
+    if empty:
+        raise SystemExit(f"No documents in {', '.join(empty)}; run seed first")
+
+    rng = random.Random(args.seed)
+    weights = [weight for weight, _ in MIX]
+    with open(args.out, "w") as f:
+        for _ in range(args.count):
+            _, make = rng.choices(MIX, weights)[0]
+            f.write(json.dumps(make(sampled, rng), default=str) + "\n")
+    print(f"Wrote {args.count} requests to {args.out}", file=sys.stderr)
+
+
+def load_requests(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def send_request(client, item):
+    # body es JSON; body_raw, texto tal cual (p. ej. NDJSON grabado)
+    body = item.get("body")
+    return await client.request(
+        item["method"], item["path"], params=item.get("params") or None,
+        json=body if body is not None else None, content=item.get("body_raw"),
+        headers=item.get("headers"),
+    )
+
+
+def summarize(results, elapsed):
+    return {
+        endpoint: {
+            "count": len(stats["latencies"]),
+            "errors": stats["errors"],
+            "throughput": round(len(stats["latencies"]) / elapsed, 1),
+            "p50_ms": round(percentile(stats["latencies"], 50) * 1000, 3),
+            "p95_ms": round(percentile(stats["latencies"], 95) * 1000, 3),
+            "p99_ms": round(percentile(stats["latencies"], 99) * 1000, 3),
+        }
+        for endpoint, stats in sorted(results.items())
+    }
+
+
+async def run_level(client, requests, concurrency, total):
+    results = {}  # endpoint -> {"latencies": [...], "errors": n}
+    position = iter(range(total))
+
+    async def worker():
+        for i in position:
+            item = requests[i % len(requests)]
+            endpoint = item.get("endpoint") or f"{item['method']} {item['path']}"
+            start = time.perf_counter()
+            try:
+                response = await send_request(client, item)
+                failed = response.status_code >= 500
+            except httpx.HTTPError:
+                failed = True
+            stats = results.setdefault(endpoint, {"latencies": [], "errors": 0})
+            stats["latencies"].append(time.perf_counter() - start)
+            stats["errors"] += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 1),
+        "endpoints": summarize(results, elapsed),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(args):
+    requests = load_requests(args.requests)
+    rng = random.Random(args.seed)
+    rng.shuffle(requests)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "url": args.url,
+        "requests_file": args.requests,
+        "levels": [],
+    }
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        if args.warmup:
+            await run_level(client, requests, max(1, min(16, args.warmup)), args.warmup)
+        for level in (int(x) for x in args.levels.split(",")):
+            result = await run_level(client, requests, level, args.total)
+            print(f"c={level:>4}  rps={result['throughput']:>9.1f}", file=sys.stderr)
+            report["levels"].append(result)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def compare(args):
+# Cambio relativo de throughput y p99 por nivel y endpoint entre dos resultados
+    with open(args.before) as f:
+        before = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    with open(args.after) as f:
+        after = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    for concurrency in sorted(before.keys() & after.keys()):
+        old, new = before[concurrency], after[concurrency]
+        print(f"c={concurrency}  throughput {old['throughput']} -> {new['throughput']} "
+              f"({(new['throughput'] / old['throughput'] - 1) * 100:+.1f}%)")
+        for endpoint in sorted(old["endpoints"].keys() & new["endpoints"].keys()):
+            a, b = old["endpoints"][endpoint], new["endpoints"][endpoint]
+            change = (b["p99_ms"] / a["p99_ms"] - 1) * 100 if a["p99_ms"] else 0.0
+            print(f"  {endpoint:<48} p99 {a['p99_ms']:>9.2f} -> {b['p99_ms']:>9.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("seed", help="insertar datos sinteticos")
+    p.add_argument("--scale", type=float, default=1.0)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--drop", action="store_true", help="vaciar las colecciones antes")
+
+    p = commands.add_parser("generate", help="generar una mezcla de peticiones en JSONL")
+    p.add_argument("--out", default="bench/mix.jsonl")
+    p.add_argument("--count", type=int, default=10_000)
+    p.add_argument("--sample", type=int, default=1000, help="documentos muestreados por coleccion")
+    p.add_argument("--seed", type=int, default=42)
+
+    p = commands.add_parser("run", help="reproducir un JSONL a varios niveles de concurrencia")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--requests", default="bench/mix.jsonl")
+    p.add_argument("--levels", default="1,16,64")
+    p.add_argument("--total", type=int, default=5000, help="peticiones por nivel")
+    p.add_argument("--warmup", type=int, default=500)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--output")
+
+    p = commands.add_parser("compare", help="comparar dos resultados de run")
+    p.add_argument("before")
+    p.add_argument("after")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args)
+    else:
+        asyncio.run({"seed": seed, "generate": generate, "run": run}[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
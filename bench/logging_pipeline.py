@@ -0,0 +1,71 @@
+# Benchmark del coste de logging en el camino de GET /students/oneStudentbyId/{id}.
+#
+# Reproduce las tres llamadas a logger.info del handler y compara:
+#   - basicConfig: f-strings formateadas al momento y StreamHandler sincrono
+#   - setup_logging: cola con escritura en segundo plano y formato diferido
+#   - setup_logging con muestreo al 1% de los logs de exito
+# La salida de los logs va a un fichero temporal en los tres casos.
+#
+#   python bench/logging_pipeline.py
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import logconfig  # noqa: E402
+
+REQUESTS = 100_000
+ID = "665f1c2e9b1e8a3d4c5b6a79"
+
+
+def get_one_student_by_id_eager(logger, id):
+    logger.info(f"Received request to get student by ID: {id}")
+    logger.info(f"Returning student with ID: {id}")
+
+
+def get_one_student_by_id(logger, id):
+    logger.info("Received request to get student by ID: %s", id)
+    logger.info("Returning student with ID: %s", id)
+
+
+def run(handler_fn, logger):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        handler_fn(logger, ID)
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def reset(root):
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+
+def main():
+    root = logging.getLogger()
+    logger = logging.getLogger("bench")
+    with tempfile.TemporaryDirectory() as tmp:
+        out = open(os.path.join(tmp, "log.txt"), "w")
+
+        reset(root)
+        logging.basicConfig(level=logging.INFO, stream=out, force=True)
+        sync_rps = run(get_one_student_by_id_eager, logger)
+
+        results = [("basicConfig + f-strings", sync_rps)]
+        for label, rates in (("queue pipeline", ""), ("queue pipeline, 1% sampled", "get_one_student_by_id=0.01")):
+            reset(root)
+            os.environ["LOG_SAMPLE_RATES"] = rates
+            sys.stderr, stderr = out, sys.stderr
+            listener = logconfig.setup_logging()
+            sys.stderr = stderr
+            results.append((label, run(get_one_student_by_id, logger)))
+            logconfig._stop(listener)
+
+        out.close()
+    for label, rps in results:
+        print(f"{label:<30} {rps:>12,.0f} req/s  ({rps / sync_rps:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
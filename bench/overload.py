@@ -0,0 +1,106 @@
+# Benchmark de sobrecarga contra una instancia en marcha de la API.
+#
+# Primero mide la capacidad (peticiones/s con carga cerrada a --concurrency) y
+# despues lanza carga abierta a --overload veces esa tasa: las peticiones
+# llegan a ritmo fijo aunque el servidor no de abasto, como el trafico real.
+# Muestra p50/p99 de las respuestas servidas y el porcentaje rechazado con 503.
+# Se compara con ADMISSION_CONTROL=0 para ver la latencia sin control:
+#
+#   uvicorn main:app
+#   python bench/overload.py --path /students/oneStudentbyId/<id> --overload 5
+#
+# Requiere httpx (pip install httpx).
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def capacity(client, path, concurrency, duration):
+    done = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            response = await client.get(path)
+            if response.status_code < 500:
+                done += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done / duration
+
+
+async def open_loop(client, path, rate, duration):
+    served = []
+    shed = 0
+    failed = 0
+
+    async def one():
+        nonlocal shed, failed
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+        except httpx.HTTPError:
+            failed += 1
+            return
+        if response.status_code == 503:
+            shed += 1
+        elif response.status_code >= 500:
+            failed += 1
+        else:
+            served.append(time.perf_counter() - start)
+
+    tasks = []
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < duration:
+        # Enviar las peticiones que tocan segun la tasa fijada
+        due = int((time.perf_counter() - start) * rate)
+        while sent < due:
+            tasks.append(asyncio.create_task(one()))
+            sent += 1
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    return {
+        "sent": sent,
+        "served_rps": len(served) / duration,
+        "shed_pct": shed / max(sent, 1) * 100,
+        "failed": failed,
+        "p50_ms": percentile(served, 50) * 1000,
+        "p99_ms": percentile(served, 99) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", required=True)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--overload", default="1,2,5", help="multiplos de la capacidad medida")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        rps = await capacity(client, args.path, args.concurrency, args.duration)
+        print(f"capacity={rps:.1f} req/s")
+        for factor in (float(x) for x in args.overload.split(",")):
+            result = await open_loop(client, args.path, rps * factor, args.duration)
+            print(
+                f"load={factor:>4.1f}x  sent={result['sent']:>7}  served={result['served_rps']:>9.1f}/s  "
+                f"shed={result['shed_pct']:>5.1f}%  p50={result['p50_ms']:>8.2f}ms  "
+                f"p99={result['p99_ms']:>8.2f}ms  failed={result['failed']}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
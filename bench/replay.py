@@ -0,0 +1,107 @@
+# Reproduccion de trafico grabado (REQUEST_RECORDING=1) contra una instancia de pruebas.
+#
+#   python bench/replay.py recorded_requests.jsonl --url http://staging:8000 --speed 1
+#   python bench/replay.py recorded_requests.jsonl --speed 10 --clients 256
+#   python bench/replay.py recorded_requests.jsonl --speed 0 --clients 64   # lo mas rapido posible
+#
+# Las peticiones salen en el orden grabado. Con --speed N cada una se envia
+# en su instante original dividido por N (carga abierta: no espera a las
+# anteriores); con --speed 0 las envian --clients clientes lo mas rapido
+# posible. Las peticiones grabadas con cuerpo pero sin guardarlo
+# (REQUEST_RECORDING_BODIES desactivado) no se pueden reproducir y se saltan.
+# Escribe el mismo JSON por endpoint que bench/harness.py run.
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import load_requests, send_request, summarize, git_commit  # noqa: E402
+
+
+def replayable(item):
+    return not item.get("body_size") or "body" in item or "body_raw" in item
+
+
+async def paced(client, requests, speed, clients):
+    results = {}
+    semaphore = asyncio.Semaphore(clients)
+    late = 0
+
+    async def one(item):
+        endpoint = item.get("endpoint") or f"{item['method']} {item['path']}"
+        stats = results.setdefault(endpoint, {"latencies": [], "errors": 0})
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await send_request(client, item)
+                failed = response.status_code >= 500
+            except httpx.HTTPError:
+                failed = True
+            stats["latencies"].append(time.perf_counter() - start)
+            stats["errors"] += failed
+
+    tasks = []
+    first = requests[0].get("ts", 0.0)
+    start = time.perf_counter()
+    for item in requests:
+        if speed > 0:
+            delay = (item.get("ts", first) - first) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.1:
+                late += 1
+        tasks.append(asyncio.create_task(one(item)))
+    await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start, late
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = ritmo original, 10 = diez veces mas rapido, 0 = sin pausas")
+    parser.add_argument("--clients", type=int, default=128, help="peticiones en curso como maximo")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    recorded = load_requests(args.recording)
+    requests = sorted((item for item in recorded if replayable(item)), key=lambda item: item.get("ts", 0.0))
+    skipped = len(recorded) - len(requests)
+    if not requests:
+        raise SystemExit("Nothing to replay")
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        results, elapsed, late = await paced(client, requests, args.speed, args.clients)
+
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "url": args.url,
+        "requests_file": args.recording,
+        "speed": args.speed,
+        "clients": args.clients,
+        "requests": len(requests),
+        "skipped": skipped,
+        # Peticiones que salieron mas de 100 ms tarde: el cliente no mantuvo el ritmo
+        "late": late,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(requests) / elapsed, 1),
+        "endpoints": summarize(results, elapsed),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
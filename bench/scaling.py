@@ -0,0 +1,104 @@
+# Benchmark de escalado multi-proceso de serve.py.
+#
+# Para cada numero de workers arranca serve.py, espera a /health/live y lanza
+# la carga desde varios procesos cliente (un solo proceso cliente se satura
+# antes que el servidor). Muestra throughput y eficiencia respecto a 1 worker.
+#
+#   python bench/scaling.py --path /students/oneStudentbyId/<id> --workers 1,2,4,8
+#
+# Requiere httpx (pip install httpx) y un mongod con datos (MONGO_URI).
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health/live", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def load(url, path, concurrency, duration):
+    done = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal done, errors
+            while time.perf_counter() < deadline:
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                done += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done, errors
+
+
+def client_process(args):
+    return asyncio.run(load(*args))
+
+
+def run(workers, args):
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--port", str(args.port), "--workers", str(workers)],
+        cwd=ROOT,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(url)
+        # Calentar conexiones al pool de Mongo de todos los workers
+        client_process((url, args.path, args.concurrency, 1))
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client_process, [(url, args.path, args.concurrency, args.duration)] * args.clients)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    requests = sum(done for done, _ in results)
+    return requests / elapsed, sum(errors for _, errors in results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", required=True)
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, os.cpu_count() or 1)))
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--clients", type=int, default=4, help="procesos cliente generando carga")
+    parser.add_argument("--concurrency", type=int, default=64, help="peticiones concurrentes por cliente")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in sorted({int(n) for n in args.workers.split(",")}):
+        rps, errors = run(workers, args)
+        if baseline is None:
+            baseline = (workers, rps)
+        efficiency = (rps / baseline[1]) / (workers / baseline[0]) * 100
+        print(f"workers={workers:>3}  rps={rps:>9.1f}  speedup={rps / baseline[1]:>5.2f}x  "
+              f"efficiency={efficiency:>5.1f}%  errors={errors}")
+
+
+if __name__ == "__main__":
+    main()
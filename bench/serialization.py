@@ -0,0 +1,72 @@
+# Microbenchmark del camino de serializacion de las respuestas.
+#
+# Compara el camino anterior (convertir _id a str en un bucle, pasar por
+# jsonable_encoder y JSONResponse) con MongoJSONResponse, que codifica los
+# tipos BSON directamente, para listas de 1k, 10k y 100k documentos.
+#
+#   python bench/serialization.py
+import datetime
+import os
+import sys
+import time
+
+from bson import ObjectId, Decimal128
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serialization import MongoJSONResponse  # noqa: E402
+
+
+def make_docs(count):
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Patent {i}",
+            "contributors": [f"Scientist {i}", f"Scientist {i + 1}"],
+            "date": "2024-01-01",
+            "uri": f"urn:patent:{i}",
+            "url": f"https://example.org/patents/{i}",
+            "summary": "Lorem ipsum dolor sit amet " * 8,
+            "fee": Decimal128("12.50"),
+            "updated": datetime.datetime(2024, 1, 1, 12, 0),
+        }
+        for i in range(count)
+    ]
+
+
+def current_path(docs):
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+        doc["fee"] = str(doc["fee"])
+    return JSONResponse(jsonable_encoder(docs)).body
+
+
+def mongo_path(docs):
+    return MongoJSONResponse(docs).body
+
+
+def timed(fn, docs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        batch = [dict(doc) for doc in docs]
+        start = time.perf_counter()
+        fn(batch)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    for count in (1_000, 10_000, 100_000):
+        docs = make_docs(count)
+        repeat = 5 if count < 100_000 else 2
+        before = timed(current_path, docs, repeat)
+        after = timed(mongo_path, docs, repeat)
+        print(
+            f"{count:>7} docs  jsonable_encoder={before * 1000:>9.1f}ms  "
+            f"MongoJSONResponse={after * 1000:>8.1f}ms  speedup={before / after:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
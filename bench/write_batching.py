@@ -0,0 +1,70 @@
+# Benchmark de altas con insert_one frente a InsertBatcher (group commit).
+#
+# N productores concurrentes insertan documentos de patentes en una coleccion
+# temporal; se mide el throughput con insert_one y con el batcher para varias
+# politicas de flush. Usa MONGO_URI (por defecto un mongod local).
+#
+#   python bench/write_batching.py --producers 200 --docs 20000
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from pymongo import AsyncMongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batching import InsertBatcher  # noqa: E402
+
+
+def patent(i):
+    return {
+        "name": f"Patent {i}",
+        "contributors": [f"Scientist {i}"],
+        "date": "2024-01-01",
+        "uri": f"urn:patent:{i}",
+        "url": f"https://example.org/patents/{i}",
+        "summary": "Lorem ipsum dolor sit amet " * 8,
+    }
+
+
+async def run(insert, producers, total):
+    counter = iter(range(total))
+
+    async def producer():
+        for i in counter:
+            await insert(patent(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(producers)))
+    return total / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--producers", type=int, default=200)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--policies", default="50:2,100:5,500:10", help="max_docs:max_delay_ms,...")
+    args = parser.parse_args()
+
+    client = AsyncMongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    collection = client["bench"]["write_batching"]
+    try:
+        await collection.drop()
+        baseline = await run(collection.insert_one, args.producers, args.docs)
+        print(f"{'insert_one':<28} {baseline:>10,.0f} docs/s")
+        for policy in args.policies.split(","):
+            max_docs, max_delay_ms = (int(x) for x in policy.split(":"))
+            await collection.drop()
+            batcher = InsertBatcher(collection, max_docs, max_delay_ms / 1000)
+            rate = await run(batcher.insert, args.producers, args.docs)
+            await batcher.close()
+            label = f"batcher {max_docs} docs / {max_delay_ms} ms"
+            print(f"{label:<28} {rate:>10,.0f} docs/s  ({rate / baseline:.1f}x, {batcher.batches} batches)")
+    finally:
+        await collection.drop()
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
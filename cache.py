@@ -0,0 +1,241 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+
+import bson
+
+logger = logging.getLogger(__name__)
+
+# How long an invalidation is remembered. A read that started before an
+# invalidation and finishes later than this could still fill a stale entry;
+# Mongo reads time out long before.
+INVALIDATION_HORIZON = 300.0
+
+
+# In-process LRU cache with TTL, bounded by entry count and encoded size.
+# Keys are (collection, id) tuples and values are documents.
+#
+# Every key has a generation that delete() bumps. A reader takes the
+# generation before going to Mongo and passes it to set(), which refuses the
+# document if the key was invalidated in between, so a read racing with a
+# write cannot put the pre-write document back in the cache.
+class LocalCache:
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, doc)
+        self._bytes = 0
+        self._generations = OrderedDict()  # key -> (generation, bumped_at)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_fills = 0
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, size, doc = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(doc)
+
+    async def generation(self, key):
+        entry = self._generations.get(key)
+        return entry[0] if entry is not None else 0
+
+    async def set(self, key, doc, generation=None):
+        if generation is not None and generation != await self.generation(key):
+            self.stale_fills += 1
+            return
+        size = len(bson.encode(doc))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, dict(doc))
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete(self, key):
+        now = time.monotonic()
+        generation = await self.generation(key) + 1
+        self._generations.pop(key, None)
+        self._generations[key] = (generation, now)
+        # Forget invalidations older than the horizon, oldest first
+        while self._generations:
+            oldest, (_, bumped_at) = next(iter(self._generations.items()))
+            if bumped_at > now - INVALIDATION_HORIZON:
+                break
+            del self._generations[oldest]
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        return {
+            "backend": "local",
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale_fills": self.stale_fills,
+        }
+
+
+# Shared cache stored in Redis so several workers see the same entries and
+# invalidations. Redis itself enforces the TTL and the memory bound
+# (maxmemory + an LRU policy), so evictions are not counted here.
+#
+# Generations live in their own keys. delete() bumps the generation before
+# removing the entry, and set() checks it both before and after writing, so
+# an invalidation that lands in between removes the entry either way.
+class RedisCache:
+    def __init__(self, url=None, ttl=60.0, prefix="doc", client=None):
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self._redis = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.stale_fills = 0
+
+    def _key(self, key):
+        collection, id = key
+        return f"{self.prefix}:{collection}:{id}"
+
+    def _generation_key(self, key):
+        collection, id = key
+        return f"{self.prefix}-gen:{collection}:{id}"
+
+    async def generation(self, key):
+        return int(await self._redis.get(self._generation_key(key)) or 0)
+
+    async def get(self, key):
+        raw = await self._redis.get(self._key(key))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bson.decode(raw)
+
+    async def set(self, key, doc, generation=None):
+        if generation is not None and generation != await self.generation(key):
+            self.stale_fills += 1
+            return
+        await self._redis.set(self._key(key), bson.encode(doc), px=int(self.ttl * 1000))
+        if generation is not None and generation != await self.generation(key):
+            self.stale_fills += 1
+            await self._redis.delete(self._key(key))
+
+    async def delete(self, key):
+        generation_key = self._generation_key(key)
+        await self._redis.incr(generation_key)
+        await self._redis.pexpire(generation_key, int(INVALIDATION_HORIZON * 1000))
+        await self._redis.delete(self._key(key))
+
+    def stats(self):
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_fills": self.stale_fills,
+        }
+
+
+# In-process stand-in for the few redis.asyncio calls RedisCache makes, so the
+# shared backend can run (in tests or on one machine) without a Redis server.
+class MemoryRedis:
+    def __init__(self):
+        self._values = {}  # key -> (value, expires_at or None)
+
+    def _live(self, key):
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] < time.monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    async def get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry is not None else None
+
+    async def set(self, key, value, px=None):
+        self._values[key] = (value, time.monotonic() + px / 1000 if px else None)
+
+    async def delete(self, key):
+        self._values.pop(key, None)
+
+    async def incr(self, key):
+        entry = self._live(key)
+        value = int(entry[0]) + 1 if entry is not None else 1
+        self._values[key] = (str(value).encode(), entry[1] if entry is not None else None)
+        return value
+
+    async def pexpire(self, key, ms):
+        entry = self._live(key)
+        if entry is not None:
+            self._values[key] = (entry[0], time.monotonic() + ms / 1000)
+
+
+# No caching: every read goes to Mongo. Used when several workers run without
+# a shared backend, where per-worker caches would serve stale documents.
+class NullCache:
+    def __init__(self):
+        self.misses = 0
+
+    async def get(self, key):
+        self.misses += 1
+        return None
+
+    async def generation(self, key):
+        return 0
+
+    async def set(self, key, doc, generation=None):
+        pass
+
+    async def delete(self, key):
+        pass
+
+    def stats(self):
+        return {"backend": "none", "hits": 0, "misses": self.misses}
+
+
+def get_cache():
+# Build the document cache configured through environment variables
+    backend = os.getenv("CACHE_BACKEND", "local")
+    ttl = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+    if backend == "redis":
+        logger.info("Using Redis document cache")
+        return RedisCache(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl)
+    if backend == "none":
+        logger.info("Document cache disabled")
+        return NullCache()
+    if backend == "memory-redis":
+        # The Redis code path without a server; entries are not shared
+        return RedisCache(ttl=ttl, client=MemoryRedis())
+    return LocalCache(
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "10000")),
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=ttl,
+    )
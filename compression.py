@@ -0,0 +1,230 @@
+import os
+import zlib
+import logging
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; br is not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; zstd is not offered without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Media types worth compressing; everything else (images, already compressed
+# archives) is passed through untouched
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        # Sync flush so every streamed chunk reaches the client right away
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._c = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._c.compress(data)
+
+    def flush(self):
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# encoding -> (compressor class, environment variable with its level, default level)
+ENCODERS = {"gzip": (_Gzip, "COMPRESSION_GZIP_LEVEL", 6)}
+if brotli is not None:
+    ENCODERS["br"] = (_Brotli, "COMPRESSION_BR_LEVEL", 4)
+if zstandard is not None:
+    ENCODERS["zstd"] = (_Zstd, "COMPRESSION_ZSTD_LEVEL", 3)
+
+
+def parse_accept_encoding(header):
+# Map each encoding the client accepts to its q value
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    return accepted
+
+
+def choose_encoding(header, preference):
+# Best encoding in server preference order among those the client accepts
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in preference:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+# Pure ASGI middleware that compresses JSON and NDJSON responses. Bodies sent
+# in one message are compressed only above the size threshold, so small
+# by-id responses go out as they are; streamed bodies are compressed chunk
+# by chunk with a flush after each one. Whenever an encoding is negotiated the
+# ETag is made weak, whatever the size, so 200 and 304 responses match.
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=None, encodings=None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        preference = encodings or os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+        self.preference = [e.strip() for e in preference if e.strip() in ENCODERS]
+        self.levels = {name: int(os.getenv(variable, default)) for name, (_, variable, default) in ENCODERS.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.preference:
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept, self.preference) if accept else None
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    # A 304 has no body to compress but stands in for the
+                    # representation the client would get, so it carries the
+                    # same Vary and validator as that response
+                    headers = _Headers(message["headers"])
+                    headers.add_vary()
+                    if encoding is not None:
+                        headers.weaken_etag()
+                    passthrough = True
+                    await send({**message, "headers": headers.raw})
+                    return
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = _Headers(start["headers"])
+                if not _compressible(headers, start["status"]):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers.add_vary()
+                # The validator depends on the negotiated encoding only, not on
+                # the size, so a 200 and the 304 that revalidates it always agree
+                if encoding is not None:
+                    headers.weaken_etag()
+                if encoding is None or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    start["headers"] = headers.raw
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = ENCODERS[encoding][0](self.levels[encoding])
+                headers.set_encoding(encoding)
+                start["headers"] = headers.raw
+                if not more_body:
+                    data = compressor.compress(body) + compressor.finish()
+                    headers.set_length(len(data))
+                    start["headers"] = headers.raw
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send(start)
+
+            data = compressor.compress(body)
+            data += compressor.flush() if more_body else compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _compressible(headers, status):
+    if status < 200 or status in (204, 304) or headers.get(b"content-encoding"):
+        return False
+    content_type = headers.get(b"content-type").decode("latin-1")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _Headers:
+    # Minimal editor for the raw ASGI header list of a response start message
+
+    def __init__(self, raw):
+        self.raw = list(raw)
+
+    def get(self, name):
+        for key, value in self.raw:
+            if key.lower() == name:
+                return value
+        return b""
+
+    def _set(self, name, value):
+        self.raw = [(k, v) for k, v in self.raw if k.lower() != name]
+        self.raw.append((name, value))
+
+    def add_vary(self):
+        vary = self.get(b"vary")
+        if b"accept-encoding" not in vary.lower():
+            self._set(b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding")
+
+    def set_encoding(self, encoding):
+        self._set(b"content-encoding", encoding.encode())
+        self.raw = [(k, v) for k, v in self.raw if k.lower() != b"content-length"]
+
+    def weaken_etag(self):
+        # Compressed bytes differ from the identity representation, so a
+        # negotiated response gets a weak validator; etag comparisons in main
+        # ignore the W/ prefix
+        etag = self.get(b"etag")
+        if etag and not etag.startswith(b"W/"):
+            self._set(b"etag", b"W/" + etag)
+
+    def set_length(self, length):
+        self._set(b"content-length", str(length).encode())
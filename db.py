@@ -1,31 +1,184 @@
 import os
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
+from pymongo import monitoring
 import logging
+from metrics import command_metrics
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Client options read from the environment: (variable, option, type)
+CLIENT_OPTIONS = [
+    ("MONGO_MAX_POOL_SIZE", "maxPoolSize", int),
+    ("MONGO_MIN_POOL_SIZE", "minPoolSize", int),
+    ("MONGO_MAX_IDLE_TIME_MS", "maxIdleTimeMS", int),
+    ("MONGO_MAX_CONNECTING", "maxConnecting", int),
+    ("MONGO_WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS", int),
+    ("MONGO_CONNECT_TIMEOUT_MS", "connectTimeoutMS", int),
+    ("MONGO_SOCKET_TIMEOUT_MS", "socketTimeoutMS", int),
+    ("MONGO_SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS", int),
+    ("MONGO_TIMEOUT_MS", "timeoutMS", int),
+    ("MONGO_COMPRESSORS", "compressors", str),
+]
+
+
+def available_compressors():
+# Wire compressors pymongo can use here, best first; zlib is always present
+    compressors = []
+    try:
+        import zstandard  # noqa: F401
+        compressors.append("zstd")
+    except ImportError:
+        pass
+    try:
+        import snappy  # noqa: F401
+        compressors.append("snappy")
+    except ImportError:
+        pass
+    compressors.append("zlib")
+    return ",".join(compressors)
+
+
+def client_options():
+# Collect the pool and timeout settings that are set in the environment
+    options = {}
+    for variable, option, cast in CLIENT_OPTIONS:
+        value = os.getenv(variable)
+        if value:
+            options[option] = cast(value)
+    # Negotiate wire compression by default; MONGO_COMPRESSORS=none turns it off
+    compressors = options.pop("compressors", None) or available_compressors()
+    if compressors.lower() != "none":
+        options["compressors"] = compressors
+    return options
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    # Tracks connection pool health from pymongo's CMAP events
+
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self.paused_pools = set()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        self.paused_pools.discard(event.address)
+
+    def pool_cleared(self, event):
+        self.pool_clears += 1
+        self.paused_pools.add(event.address)
+
+    def pool_closed(self, event):
+        self.paused_pools.discard(event.address)
+
+    def connection_created(self, event):
+        self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def stats(self):
+        return {
+            "open_connections": self.open_connections,
+            "checked_out": self.checked_out,
+            "checkout_failures": self.checkout_failures,
+            "pool_clears": self.pool_clears,
+            "paused_pools": [f"{host}:{port}" for host, port in self.paused_pools],
+        }
+
+
+# One monitor per process; every client created here reports to it
+pool_monitor = PoolMonitor()
+
+
 def get_database():
-# Test connection
     try:
     # Get MongoDB URI from environment variable
         mongodb_uri = os.getenv("MONGO_URI")
 
-        # create a client
-        client = MongoClient(mongodb_uri)
+        # create an async client; it connects lazily on the first operation,
+        # so no network I/O happens here. Call this once per worker process,
+        # after forking.
+        client = AsyncMongoClient(
+            mongodb_uri,
+            event_listeners=[pool_monitor, command_metrics],
+            **client_options(),
+        )
 
         # Access a specific database
         db = client['test']
+        return db
 
-        # The ismaster command is cheap and does not require auth.
-        client.admin.command('ismaster')
+    except Exception as e:
+        logger.error(f"Error connecting to MongoDB: {e}")
+        raise
+
+
+async def check_connection(db):
+# Test connection
+    try:
+        # The ping command is cheap and does not require auth.
+        await db.client.admin.command('ping')
         logger.info("Successfully connected to MongoDB!")
-        return db
-    
+
     except Exception as e:
         logger.error(f"Error connecting to MongoDB: {e}")
         raise
 
 
+async def ensure_indexes(db, indexes):
+# Create every declared index; create_indexes is a no-op for existing ones
+    for collection, models in indexes.items():
+        names = await db[collection].create_indexes(models)
+        logger.info(f"Indexes ready on {collection}: {', '.join(names)}")
+
+
+def _plan_stages(plan):
+    # Walk an explain() plan tree and yield every stage name in it
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
 
+async def verify_query_plans(db, query_shapes):
+# Run explain() on each query shape and fail if any winning plan is a COLLSCAN
+    collscans = []
+    for endpoint, (collection, query, sort) in query_shapes.items():
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = set(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in stages:
+            logger.error(f"Query plan for {endpoint} on {collection} is a COLLSCAN: {query}")
+            collscans.append(endpoint)
+        else:
+            logger.info(f"Query plan for {endpoint} on {collection} uses: {', '.join(sorted(stages))}")
+    if collscans:
+        raise RuntimeError(f"Collection scans in query plans for: {', '.join(collscans)}")
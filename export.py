@@ -0,0 +1,330 @@
+# Bulk export of a collection to NDJSON or Parquet.
+#
+#   python export.py patents --out exports/ --parallel 8
+#   python export.py scientists --format parquet --filter '{"category": "A"}' --fields name,cneaiField
+#
+# The collection is split into _id ranges from a $sample of the ids, and each
+# range is exported by its own process into its own part file, reading raw
+# BSON batches from a secondary when there is one. Every part keeps a JSON
+# checkpoint (last _id written and file offset), so running the same command
+# again after a failure resumes where each range stopped.
+import os
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from bson import json_util, ObjectId, Decimal128
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import ReadPreference
+
+from serialization import dumps
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional; only needed for --format parquet
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+RAW_BSON = CodecOptions(document_class=RawBSONDocument)
+# Documents per cursor batch and per write
+BATCH_SIZE = 1000
+# Documents between checkpoints of an NDJSON part
+CHECKPOINT_EVERY = 50_000
+# Rows per Parquet row group and per Parquet file (a checkpoint per file)
+ROW_GROUP_SIZE = 10_000
+ROWS_PER_FILE = 500_000
+# Ids sampled per range to place the range boundaries
+SAMPLES_PER_RANGE = 20
+
+# Operators that run JavaScript on the server are not accepted in filters
+FORBIDDEN_OPERATORS = {"$where", "$function", "$accumulator"}
+
+
+def _check_operators(value):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in FORBIDDEN_OPERATORS:
+                raise ValueError(f"Operator {key} is not allowed in export filters")
+            _check_operators(item)
+    elif isinstance(value, list):
+        for item in value:
+            _check_operators(item)
+
+
+def parse_filter(text):
+# Parse an Extended JSON filter such as {"_id": {"$oid": "..."}}
+    if not text:
+        return {}
+    try:
+        query = json_util.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Invalid filter: {e}")
+    if not isinstance(query, dict):
+        raise ValueError("The filter must be a JSON object")
+    _check_operators(query)
+    return query
+
+
+def fields_projection(fields):
+# Inclusion projection from a list of field names; _id is always kept
+    if not fields:
+        return None
+    return {name: 1 for name in fields} | {"_id": 1}
+
+
+def export_collection(db, name):
+# Collection handle for exports: raw BSON documents, read from a secondary if possible
+    return db[name].with_options(codec_options=RAW_BSON, read_preference=ReadPreference.SECONDARY_PREFERRED)
+
+
+def range_filter(query, lo=None, hi=None, after=None):
+# Restrict query to lo <= _id < hi, or to _id > after when resuming
+    bounds = {}
+    if after is not None:
+        bounds["$gt"] = after
+    elif lo is not None:
+        bounds["$gte"] = lo
+    if hi is not None:
+        bounds["$lt"] = hi
+    if not bounds:
+        return query
+    if not query:
+        return {"_id": bounds}
+    return {"$and": [query, {"_id": bounds}]}
+
+
+async def split_ranges(collection, query, parts):
+# Split the matching documents into about equal _id ranges using sampled quantiles
+    if parts <= 1:
+        return [(None, None)]
+    # Without a filter $sample is the first stage and reads random documents
+    # without a full scan; after a $match it samples whatever the match
+    # returns, which costs as much as reading the matching documents once
+    pipeline = [{"$match": query}] if query else []
+    pipeline += [{"$sample": {"size": parts * SAMPLES_PER_RANGE}}, {"$project": {"_id": 1}}]
+    cursor = await collection.aggregate(pipeline)
+    ids = sorted(doc["_id"] for doc in await cursor.to_list(None))
+    boundaries = []
+    for i in range(1, parts):
+        if ids:
+            boundary = ids[len(ids) * i // parts]
+            if not boundaries or boundary != boundaries[-1]:
+                boundaries.append(boundary)
+    return list(zip([None, *boundaries], [*boundaries, None]))
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json_util.loads(f.read())
+
+
+def save_json(path, value):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(json_util.dumps(value))
+    os.replace(tmp, path)
+
+
+async def export_ndjson(collection, query, fields, path, checkpoint_path, lo, hi):
+# Export one range to one NDJSON file; returns the number of documents written
+    state = load_json(checkpoint_path) or {"last_id": None, "offset": 0, "documents": 0, "done": False}
+    if state["done"]:
+        return state["documents"]
+    cursor = collection.find(
+        range_filter(query, lo, hi, after=state["last_id"]),
+        fields,
+        sort=[("_id", 1)],
+        batch_size=BATCH_SIZE,
+    )
+    saved = state["documents"]
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        # Drop anything written after the last checkpoint
+        f.truncate(state["offset"])
+        f.seek(state["offset"])
+        lines = []
+        async for doc in cursor:
+            lines.append(dumps(doc))
+            if len(lines) < BATCH_SIZE:
+                continue
+            f.write(b"\n".join(lines) + b"\n")
+            state["documents"] += len(lines)
+            state["last_id"] = doc["_id"]
+            lines = []
+            if state["documents"] - saved >= CHECKPOINT_EVERY:
+                f.flush()
+                os.fsync(f.fileno())
+                state["offset"] = f.tell()
+                save_json(checkpoint_path, state)
+                saved = state["documents"]
+        if lines:
+            f.write(b"\n".join(lines) + b"\n")
+            state["documents"] += len(lines)
+        f.flush()
+        os.fsync(f.fileno())
+        state["offset"] = f.tell()
+    state["done"] = True
+    save_json(checkpoint_path, state)
+    return state["documents"]
+
+
+def _plain(value):
+    # Python values pyarrow can convert: ids and decimals become strings
+    if isinstance(value, (dict, RawBSONDocument)):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, (ObjectId, Decimal128)):
+        return str(value)
+    return value
+
+
+async def export_parquet(collection, query, fields, path, checkpoint_path, lo, hi):
+# Export one range to numbered Parquet files; a checkpoint is saved per closed file
+    state = load_json(checkpoint_path) or {"last_id": None, "part": 0, "documents": 0, "done": False}
+    if state["done"]:
+        return state["documents"]
+    cursor = collection.find(
+        range_filter(query, lo, hi, after=state["last_id"]),
+        fields,
+        sort=[("_id", 1)],
+        batch_size=BATCH_SIZE,
+    )
+    writer = None
+    rows = []
+    rows_in_file = 0
+
+    def part_path():
+        return f"{path}-{state['part']:05d}.parquet"
+
+    def close_file(last_id):
+        nonlocal writer, rows_in_file
+        writer.close()
+        writer = None
+        state["documents"] += rows_in_file
+        state["last_id"] = last_id
+        state["part"] += 1
+        rows_in_file = 0
+        save_json(checkpoint_path, state)
+
+    def write_group(last_id):
+        nonlocal writer, rows, rows_in_file
+        table = None
+        if writer is not None:
+            try:
+                table = pyarrow.Table.from_pylist(rows, schema=writer.schema)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                # The documents no longer fit the file schema: start a new file
+                close_file(previous_id)
+        if writer is None:
+            table = pyarrow.Table.from_pylist(rows)
+            writer = pyarrow.parquet.ParquetWriter(part_path(), table.schema)
+        writer.write_table(table)
+        rows_in_file += len(rows)
+        rows = []
+        if rows_in_file >= ROWS_PER_FILE:
+            close_file(last_id)
+
+    previous_id = state["last_id"]
+    last_id = None
+    async for doc in cursor:
+        rows.append(_plain(doc))
+        if len(rows) >= ROW_GROUP_SIZE:
+            last_id = doc["_id"]
+            write_group(last_id)
+            previous_id = last_id
+    if rows:
+        write_group(None)
+        # Every document of the range is written; the last id is not needed anymore
+    if writer is not None:
+        close_file(last_id)
+    state["done"] = True
+    save_json(checkpoint_path, state)
+    return state["documents"]
+
+
+async def export_range(job):
+    from db import get_database
+
+    db = get_database()
+    try:
+        collection = export_collection(db, job["collection"])
+        query = parse_filter(job["filter"])
+        fields = fields_projection(job["fields"])
+        export = export_parquet if job["format"] == "parquet" else export_ndjson
+        return await export(collection, query, fields, job["path"], job["checkpoint"], job["lo"], job["hi"])
+    finally:
+        await db.client.close()
+
+
+def run_range(job):
+    # Entry point of each worker process: its own event loop and Mongo client
+    job = json_util.loads(job)
+    return asyncio.run(export_range(job))
+
+
+async def plan(args, manifest_path):
+# Reuse the ranges of an interrupted export, or sample new ones
+    manifest = load_json(manifest_path)
+    settings = {"collection": args.collection, "filter": args.filter or "", "fields": args.fields, "format": args.format}
+    if manifest is not None:
+        if manifest["settings"] != settings:
+            raise SystemExit(f"{manifest_path} belongs to an export with other settings; use another --out")
+        return manifest["ranges"]
+
+    from db import get_database
+
+    db = get_database()
+    try:
+        collection = db[args.collection].with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+        ranges = await split_ranges(collection, parse_filter(args.filter), args.ranges or args.parallel)
+    finally:
+        await db.client.close()
+    save_json(manifest_path, {"settings": settings, "ranges": ranges})
+    return ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a collection to NDJSON or Parquet")
+    parser.add_argument("collection")
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--format", choices=("ndjson", "parquet"), default="ndjson")
+    parser.add_argument("--filter", help="Extended JSON query")
+    parser.add_argument("--fields", type=lambda value: [name.strip() for name in value.split(",") if name.strip()])
+    parser.add_argument("--parallel", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--ranges", type=int, help="_id ranges (default: one per worker)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.format == "parquet" and pyarrow is None:
+        raise SystemExit("Parquet export needs pyarrow (pip install pyarrow)")
+    parse_filter(args.filter)
+    os.makedirs(args.out, exist_ok=True)
+    base = os.path.join(args.out, args.collection)
+    ranges = asyncio.run(plan(args, f"{base}.manifest.json"))
+    extension = "" if args.format == "parquet" else ".ndjson"
+    jobs = [
+        json_util.dumps({
+            "collection": args.collection,
+            "filter": args.filter or "",
+            "fields": args.fields,
+            "format": args.format,
+            "path": f"{base}-{i:04d}{extension}",
+            "checkpoint": f"{base}-{i:04d}.checkpoint.json",
+            "lo": lo,
+            "hi": hi,
+        })
+        for i, (lo, hi) in enumerate(ranges)
+    ]
+    with ProcessPoolExecutor(max_workers=min(args.parallel, len(jobs))) as pool:
+        total = sum(pool.map(run_range, jobs))
+    logger.info("Exported %s documents from %s in %s ranges to %s", total, args.collection, len(jobs), args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,184 @@
-from db import get_database
+from db import get_database, check_connection, ensure_indexes, verify_query_plans, pool_monitor
+from cache import get_cache
+from serialization import MongoJSONResponse, dumps
+from metrics import metrics, MetricsMiddleware, write_snapshot, render_all
+from compression import CompressionMiddleware
+from admission import AdmissionMiddleware, limiters_from_env
+from recording import RecordingMiddleware, RecordWriter
+from singleflight import SingleFlight
+from batching import InsertBatcher
+from export import parse_filter, export_collection, range_filter
+import views
+from logconfig import setup_logging
+import asyncio
+import hashlib
+import os
 import logging
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import unicodedata
+from collections import Counter
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.collation import Collation
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
-from typing import List
+from typing import Any, List, Literal, Optional, get_args, get_origin
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging: cola con escritura en segundo plano y muestreo por endpoint
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# Crear la aplicación FastAPI
-app = FastAPI()
-
+# Cliente de Mongo y cache de cada worker; se crean en el lifespan, despues del fork
+db = None
+cache = None
+# Lecturas identicas en curso, compartidas entre peticiones concurrentes del worker
+flights = SingleFlight()
+# Inserciones agrupadas por coleccion (solo con WRITE_BATCHING activo)
+batchers = {}
+
+# Write batching: agrupar las altas de estas colecciones en un insert_many
+WRITE_BATCHING = os.getenv("WRITE_BATCHING", "").lower() in ("1", "true", "yes")
+WRITE_BATCH_COLLECTIONS = ("students", "scientists", "patents")
+WRITE_BATCH_MAX_DOCS = int(os.getenv("WRITE_BATCH_MAX_DOCS", "100"))
+WRITE_BATCH_MAX_DELAY = float(os.getenv("WRITE_BATCH_MAX_DELAY_MS", "5")) / 1000
+
+# Mantener las vistas materializadas desde un change stream (requiere replica set).
+# Con serve.py solo el worker 0 las mantiene; el resto solo las lee
+MATERIALIZED_VIEWS = (os.getenv("MATERIALIZED_VIEWS", "").lower() in ("1", "true", "yes")
+                      and os.getenv("WORKER_INDEX", "0") == "0")
+
+# Con varios workers (serve.py) cada uno publica sus metricas en este directorio
+# y /metrics devuelve la suma de todos
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "5"))
+
+# Modo comprobacion: abortar el arranque si alguna consulta hace COLLSCAN
+CHECK_QUERY_PLANS = os.getenv("MONGO_CHECK_QUERY_PLANS", "").lower() in ("1", "true", "yes")
+# Tiempo maximo del ping de la comprobacion de readiness
+READY_TIMEOUT = float(os.getenv("MONGO_READY_TIMEOUT_MS", "1000")) / 1000
+
+#comprobar la conexion y crear los indices sin bloquear el arranque
+async def bootstrap_database():
+    try:
+        await check_connection(db)
+        logging.info("Conectado")
+        await ensure_indexes(db, INDEXES)
+    except Exception as e:
+        logging.error("Error: %s", e)
+
+#publicar periodicamente las metricas del worker para el agregado entre procesos
+async def publish_metrics():
+    while True:
+        write_snapshot(METRICS_DIR)
+        await asyncio.sleep(METRICS_SNAPSHOT_INTERVAL)
+
+#abrir el cliente de Mongo al arrancar cada worker y cerrarlo al parar
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db, cache
+    db = get_database()
+    cache = get_cache()
+    if WRITE_BATCHING:
+        for collection in WRITE_BATCH_COLLECTIONS:
+            batchers[collection] = InsertBatcher(db[collection], WRITE_BATCH_MAX_DOCS, WRITE_BATCH_MAX_DELAY)
+    bootstrap = None
+    maintainer = asyncio.create_task(views.maintain(db)) if MATERIALIZED_VIEWS else None
+    publisher = asyncio.create_task(publish_metrics()) if METRICS_DIR else None
+    if CHECK_QUERY_PLANS:
+        await check_connection(db)
+        await ensure_indexes(db, INDEXES)
+        await verify_query_plans(db, QUERY_SHAPES)
+    else:
+        bootstrap = asyncio.create_task(bootstrap_database())
+    yield
+    for task in (bootstrap, maintainer, publisher):
+        if task is not None:
+            task.cancel()
+    for batcher in batchers.values():
+        await batcher.close()
+    await db.client.close()
+    if recorder is not None:
+        recorder.flush()
+    if METRICS_DIR:
+        write_snapshot(METRICS_DIR)
 
+# Crear la aplicación FastAPI
+app = FastAPI(lifespan=lifespan)
+# Control de admision: presupuesto de peticiones concurrentes por tipo de ruta
+# (lecturas por id, recorridos, escrituras) y 503 con Retry-After al saturarse
+admission = limiters_from_env()
+if os.getenv("ADMISSION_CONTROL", "1").lower() not in ("0", "false", "no"):
+    app.add_middleware(AdmissionMiddleware, limiters=admission)
+# Comprimir respuestas grandes (listados, rosters, streams); las metricas quedan por fuera
+# para medir tambien el tiempo de compresion
+if os.getenv("COMPRESSION", "1").lower() not in ("0", "false", "no"):
+    app.add_middleware(CompressionMiddleware)
+# Grabacion opcional de una muestra de peticiones para reproducirlas con bench/replay.py
+recorder = None
+if os.getenv("REQUEST_RECORDING", "").lower() in ("1", "true", "yes"):
+    recorder = RecordWriter(os.getenv("REQUEST_RECORDING_PATH", "recorded_requests.jsonl"))
+    app.add_middleware(
+        RecordingMiddleware,
+        writer=recorder,
+        sample_rate=float(os.getenv("REQUEST_RECORDING_SAMPLE_RATE", "1.0")),
+        bodies=os.getenv("REQUEST_RECORDING_BODIES", "").lower() in ("1", "true", "yes"),
+    )
+app.add_middleware(MetricsMiddleware)
+
+# Estado del pool y de la cache que se publica junto al resto de metricas
+metrics.register_gauge("mongo_pool_open_connections", "Open connections in the Mongo pool.",
+                       lambda: pool_monitor.open_connections)
+metrics.register_gauge("mongo_pool_checked_out", "Connections currently checked out of the Mongo pool.",
+                       lambda: pool_monitor.checked_out)
+metrics.register_gauge("mongo_pool_checkout_failures", "Failed connection checkouts since start.",
+                       lambda: pool_monitor.checkout_failures, kind="counter")
+metrics.register_gauge("singleflight_leaders_total", "Reads that went to Mongo through the single-flight layer.",
+                       lambda: flights.leaders, kind="counter")
+metrics.register_gauge("singleflight_coalesced_total", "Reads served by joining an identical in-flight query.",
+                       lambda: flights.coalesced, kind="counter")
+metrics.register_gauge("write_batches_total", "insert_many calls made by the write batchers.",
+                       lambda: sum(batcher.batches for batcher in batchers.values()), kind="counter")
+metrics.register_gauge("write_batched_documents_total", "Documents written through the write batchers.",
+                       lambda: sum(batcher.documents for batcher in batchers.values()), kind="counter")
+metrics.register_gauge("admission_queued_requests", "Requests waiting for an admission token.",
+                       lambda: sum(len(limiter.waiters) for limiter in admission.values()))
+metrics.register_gauge("admission_rejected_total", "Requests shed with 503 by admission control.",
+                       lambda: sum(limiter.rejected + limiter.timed_out for limiter in admission.values()),
+                       kind="counter")
+metrics.register_gauge("recorded_requests_dropped_total", "Sampled requests dropped because the recorder fell behind.",
+                       lambda: recorder.dropped if recorder else 0, kind="counter")
+metrics.register_gauge("document_cache_hits", "Document cache hits since start.",
+                       lambda: cache.stats()["hits"], kind="counter")
+metrics.register_gauge("document_cache_misses", "Document cache misses since start.",
+                       lambda: cache.stats()["misses"], kind="counter")
+
+#metricas en formato de texto de Prometheus
+@app.get("/metrics")
+async def get_metrics():
+    body = render_all(METRICS_DIR) if METRICS_DIR else metrics.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+#el proceso esta vivo
+@app.get("/health/live")
+async def liveness():
+    return {"status": "ok"}
+
+#el proceso puede atender peticiones: Mongo responde y el pool no esta pausado
+@app.get("/health/ready")
+async def readiness(response: Response):
+    pool = pool_monitor.stats()
+    try:
+        await asyncio.wait_for(db.client.admin.command("ping"), READY_TIMEOUT)
+        ready = not pool["paused_pools"]
+    except Exception as e:
+        logger.warning("Readiness check failed: %s", e)
+        ready = False
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "unavailable", "pool": pool}
 
-# Conectar a la base de datos
-try:
-    db = get_database()
-    logging.info("Conectado")
-except Exception as e:
-    logging.error("Error")
-    
 #definir el modelo de datos Student
 class Student(BaseModel):
     name: str
@@ -54,143 +212,911 @@ class Scientists(BaseModel):
     cneaiField:str
     universities:list[str]
 
+#condicion de una consulta: campo, operador y valor
+class QueryFilter(BaseModel):
+    field: str
+    op: Literal["eq", "ne", "gt", "gte", "lt", "lte", "in", "nin"] = "eq"
+    value: Any
+
+#clave de ordenacion de una consulta: 1 ascendente, -1 descendente
+class QuerySort(BaseModel):
+    field: str
+    direction: Literal[1, -1] = 1
+
+#consulta tipada de una coleccion
+class QueryRequest(BaseModel):
+    filters: List[QueryFilter] = []
+    sort: List[QuerySort] = []
+    limit: int = Field(100, ge=1, le=1000)
+    fields: Optional[List[str]] = None
+
+# Comparacion de nombres sin distinguir mayusculas ni acentos, para el autocompletado
+NAME_COLLATION = Collation(locale="es", strength=1)
+
+#indices de cada coleccion, se crean al arrancar; name lleva _id para que
+#las busquedas por nombre con ?fields=name se resuelvan solo con el indice
+INDEXES = {
+    "students": [
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1"),
+        IndexModel([("age", ASCENDING)], name="age_1"),
+    ],
+    "courses": [IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1")],
+    "universities": [IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1")],
+    "scientists": [
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1"),
+        IndexModel([("universities", ASCENDING)], name="universities_1"),
+        IndexModel([("cneaiField", ASCENDING)], name="cneaiField_1"),
+        IndexModel([("category", ASCENDING)], name="category_1"),
+        IndexModel([("name", ASCENDING)], name="name_autocomplete", collation=NAME_COLLATION),
+        IndexModel(
+            [("name", TEXT), ("cneaiField", TEXT)],
+            name="text_search",
+            weights={"name": 10, "cneaiField": 2},
+            default_language="none",
+        ),
+    ],
+    "patents": [
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_1__id_1"),
+        IndexModel([("contributors", ASCENDING)], name="contributors_1"),
+        IndexModel([("date", ASCENDING)], name="date_1"),
+        IndexModel([("name", ASCENDING)], name="name_autocomplete", collation=NAME_COLLATION),
+        IndexModel(
+            [("name", TEXT), ("summary", TEXT), ("contributors", TEXT)],
+            name="text_search",
+            weights={"name": 10, "contributors": 5, "summary": 1},
+            default_language="none",
+        ),
+    ],
+}
+
+#forma de la consulta de cada endpoint: (coleccion, filtro, orden)
+QUERY_SHAPES = {
+    "get_students": ("students", {"_id": {"$gt": ObjectId()}}, [("_id", ASCENDING)]),
+    "get_one_student": ("students", {"name": ""}, None),
+    "get_one_student_by_id": ("students", {"_id": ObjectId()}, None),
+    "get_student_by_name": ("students", {"name": ""}, None),
+    "query_students_by_age": ("students", {"age": {"$gte": 0, "$lt": 0}}, [("age", ASCENDING)]),
+    "get_courses": ("courses", {"_id": {"$gt": ObjectId()}}, [("_id", ASCENDING)]),
+    "get_one_course": ("courses", {"_id": ObjectId()}, None),
+    "get_course_by_name": ("courses", {"name": ""}, None),
+    "get_students_by_course": ("students", {"_id": {"$in": [ObjectId()]}}, None),
+    "get_one_university": ("universities", {"_id": ObjectId()}, None),
+    "get_university_by_name": ("universities", {"name": ""}, None),
+    "get_carreras_by_university": ("courses", {"_id": {"$in": [ObjectId()]}}, None),
+    "get_one_scientist": ("scientists", {"_id": ObjectId()}, None),
+    "get_scientist_by_name": ("scientists", {"name": ""}, None),
+    "scientists_by_university": ("scientists", {"universities": ""}, None),
+    "scientists_by_cneai_field": ("scientists", {"cneaiField": ""}, None),
+    "get_one_patent": ("patents", {"_id": ObjectId()}, None),
+    "get_patent_by_name": ("patents", {"name": ""}, None),
+    "patents_by_contributor": ("patents", {"contributors": ""}, None),
+    "co_contributors_hop": ("patents", {"contributors": {"$in": [""]}}, None),
+}
+
+# Tamaño de pagina por defecto y maximo de los listados
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Documentos que se piden a Mongo (y se escriben) en cada lote al hacer streaming
+STREAM_BATCH_SIZE = 500
+
+#convertir ?fields=name,date en una proyeccion validada contra el modelo
+def projection(model, fields: Optional[str], versioned: bool = False) -> Optional[dict]:
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name != "_id" and name not in model.model_fields]
+    if unknown:
+        logger.error("Unknown fields requested: %s", unknown)
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # Las respuestas con ETag necesitan la version aunque no se pida
+    return {name: 1 for name in names} | ({"version": 1} if versioned else {})
+
+# Operadores de las consultas tipadas; los de lista esperan un array de valores
+QUERY_OPERATORS = {"eq": "$eq", "ne": "$ne", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte", "in": "$in", "nin": "$nin"}
+QUERY_LIST_OPERATORS = ("in", "nin")
+MAX_QUERY_LIST_VALUES = 1000
+# Tipos por los que se puede filtrar (o de los elementos, en campos lista)
+QUERY_SCALAR_TYPES = (str, int, float, bool)
+
+#tipo de los valores con los que se compara un campo del modelo
+def query_value_type(model, field: str):
+    if field == "_id":
+        return ObjectId
+    if field not in model.model_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+    annotation = model.model_fields[field].annotation
+    # En los campos lista la condicion se aplica a cada elemento
+    if get_origin(annotation) is list:
+        annotation = get_args(annotation)[0]
+    if annotation not in QUERY_SCALAR_TYPES:
+        raise HTTPException(status_code=400, detail=f"Field {field} cannot be used in queries")
+    return annotation
+
+#validar y convertir el valor de una condicion al tipo del campo
+def coerce_query_value(model, field: str, value):
+    value_type = query_value_type(model, field)
+    try:
+        if value_type is ObjectId:
+            return ObjectId(value)
+        # Estricto: true no se convierte en 1 ni "5" en 5
+        return TypeAdapter(value_type).validate_python(value, strict=True)
+    except Exception:
+        logger.error("Invalid value for %s: %r", field, value)
+        raise HTTPException(status_code=400, detail=f"Invalid value for {field}")
+
+#convertir las condiciones en un filtro de Mongo (todas deben cumplirse)
+def compile_filter(model, filters: List[QueryFilter]) -> dict:
+    query = {}
+    for condition in filters:
+        if condition.op in QUERY_LIST_OPERATORS:
+            if not isinstance(condition.value, list) or len(condition.value) > MAX_QUERY_LIST_VALUES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{condition.op} needs a list of at most {MAX_QUERY_LIST_VALUES} values",
+                )
+            value = [coerce_query_value(model, condition.field, item) for item in condition.value]
+        else:
+            value = coerce_query_value(model, condition.field, condition.value)
+        operators = query.setdefault(condition.field, {})
+        operator = QUERY_OPERATORS[condition.op]
+        if operator in operators:
+            raise HTTPException(status_code=400, detail=f"Repeated condition {condition.op} on {condition.field}")
+        operators[operator] = value
+    return query
+
+#un orden se acepta si algun indice lo cubre: tras los campos fijados por
+#igualdad, las claves del indice coinciden con las del orden en el mismo
+#sentido (o todas en el contrario), y Mongo no tiene que ordenar en memoria
+def sort_is_indexed(collection: str, sort: list, equality_fields: set) -> bool:
+    if not sort:
+        return True
+    keys = [[("_id", ASCENDING)]]
+    for index in INDEXES.get(collection, []):
+        document = index.document
+        key = list(document["key"].items())
+        # Los indices con collation solo sirven a consultas con la misma collation
+        if "collation" not in document and all(isinstance(direction, int) for _, direction in key):
+            keys.append(key)
+    sort_fields = [field for field, _ in sort]
+    for key in keys:
+        start = 0
+        while start < len(key) and key[start][0] in equality_fields and key[start][0] not in sort_fields:
+            start += 1
+        window = key[start:start + len(sort)]
+        if [field for field, _ in window] != sort_fields:
+            continue
+        if len({direction * order for (_, direction), (_, order) in zip(window, sort)}) == 1:
+            return True
+    return False
+
+#consulta tipada: filtros, orden, limite y proyeccion validados contra el modelo
+async def typed_query(collection: str, model, request: QueryRequest) -> list:
+    query = compile_filter(model, request.filters)
+    for key in request.sort:
+        query_value_type(model, key.field)
+        # Ordenar por un campo lista usa un indice multikey, y Mongo siempre
+        # añade un SORT en memoria aunque el indice exista
+        if key.field != "_id" and get_origin(model.model_fields[key.field].annotation) is list:
+            raise HTTPException(status_code=400, detail=f"Cannot sort on list field {key.field}")
+    sort = [(key.field, key.direction) for key in request.sort]
+    equality_fields = {condition.field for condition in request.filters if condition.op == "eq"}
+    if not sort_is_indexed(collection, sort, equality_fields):
+        logger.warning("Rejected unindexed sort on %s: %s", collection, sort)
+        raise HTTPException(status_code=400, detail="Sort is not supported by an index")
+    fields = projection(model, ",".join(request.fields)) if request.fields else None
+    return await find_all(collection, query, fields, sort or None, request.limit)
+
+# Resultados por pagina y desplazamiento maximo de las busquedas
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_SKIP = 1000
+
+#busqueda de texto con el indice text_search, ordenada por relevancia
+async def text_search(collection: str, q: str, limit: int, skip: int, fields: Optional[dict]):
+    score = {"score": {"$meta": "textScore"}}
+    async def run():
+        cursor = (
+            db[collection]
+            .find({"$text": {"$search": q}}, {**(fields or {}), **score})
+            .sort([("score", {"$meta": "textScore"})])
+            .skip(skip)
+            .limit(limit)
+        )
+        return await cursor.to_list(None)
+    return await flights.do(repr(("search", collection, q, limit, skip, fields)), run)
+
+#normalizar un nombre como lo compara NAME_COLLATION: sin acentos ni mayusculas
+def normalize_name(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+#autocompletado por prefijo sobre el indice name_autocomplete; los nombres que
+#empiezan por el prefijo son consecutivos en el indice, asi que se para en el primero que no
+async def autocomplete(collection: str, prefix: str, limit: int, skip: int):
+    cursor = (
+        db[collection]
+        .find({"name": {"$gte": prefix}}, {"name": 1}, collation=NAME_COLLATION)
+        .sort("name", ASCENDING)
+        .hint("name_autocomplete")
+        .skip(skip)
+        .limit(limit)
+    )
+    key = normalize_name(prefix)
+    matches = []
+    async for doc in cursor:
+        if not normalize_name(doc["name"]).startswith(key):
+            break
+        matches.append(doc)
+    return matches
+
+#etag de un documento: su version, y un resumen de la proyeccion si la hay
+def doc_etag(doc: dict, fields: Optional[dict] = None) -> str:
+    tag = str(doc.get("version", 0))
+    if fields:
+        tag += "-" + hashlib.blake2b(repr(sorted(fields)).encode(), digest_size=4).hexdigest()
+    return f'"{tag}"'
+
+#etag de un documento con sus documentos relacionados (cursos con alumnos, etc.)
+def composite_etag(doc: dict, related: str, fields: Optional[dict] = None) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{doc.get('version', 0)}|{fields and sorted(fields)}".encode())
+    for child in doc.get(related, []):
+        digest.update(f"|{child['_id']}:{child.get('version', 0)}".encode())
+    return f'"{digest.hexdigest()}"'
+
+#comprobar si alguno de los etags de If-None-Match / If-Match es el actual
+def etag_matches(header: str, tag: str) -> bool:
+    candidates = [value.strip().removeprefix("W/") for value in header.split(",")]
+    return "*" in candidates or tag in candidates
+
+#responder 304 sin serializar si el cliente ya tiene esta version
+def conditional_response(content, tag: str, if_none_match: Optional[str]):
+    if if_none_match and etag_matches(if_none_match, tag):
+        return Response(status_code=304, headers={"ETag": tag})
+    return MongoJSONResponse(content, headers={"ETag": tag})
+
+#filtro de version para las actualizaciones con If-Match (concurrencia optimista)
+def version_filter(if_match: Optional[str]) -> dict:
+    if not if_match or if_match.strip() == "*":
+        return {}
+    tag = if_match.split(",")[0].strip().removeprefix("W/").strip('"')
+    try:
+        version = int(tag)
+    except ValueError:
+        logger.warning("Unusable If-Match header: %s", if_match)
+        raise HTTPException(status_code=412, detail="Precondition failed")
+    # Los documentos anteriores al versionado no tienen el campo: version 0
+    return {"version": version} if version else {"version": {"$in": [None, 0]}}
+
+#si una actualizacion condicional no encontro el documento, distinguir 412 de 404
+async def check_precondition(collection: str, obj_id, if_match: Optional[str]):
+    if if_match and await db[collection].count_documents({"_id": obj_id}, limit=1):
+        logger.warning("Version mismatch updating %s %s", collection, obj_id)
+        raise HTTPException(status_code=412, detail="Precondition failed")
+
+#filtro de paginacion por _id a partir del ultimo id devuelto
+def keyset_filter(after: Optional[str]) -> dict:
+    if after is None:
+        return {}
+    try:
+        return {"_id": {"$gt": ObjectId(after)}}
+    except Exception:
+        logger.error("Invalid cursor format: %s", after)
+        raise HTTPException(status_code=400, detail="Invalid cursor format")
+
+#devolver una pagina e indicar en la cabecera desde donde seguir
+def page(docs: list, limit: int) -> MongoJSONResponse:
+    headers = {}
+    if len(docs) == limit:
+        headers["X-Next-After"] = str(docs[-1]["_id"])
+    return MongoJSONResponse(docs, headers=headers)
+
+#escribir NDJSON directamente desde el cursor, por lotes
+async def ndjson_lines(cursor, first=None):
+    lines = []
+    if first is not None:
+        lines.append(dumps(first))
+    async for doc in cursor:
+        lines.append(dumps(doc))
+        if len(lines) >= STREAM_BATCH_SIZE:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+#responder en streaming; si se indica not_found, 404 cuando no hay resultados
+async def stream_response(cursor, not_found: Optional[str] = None):
+    cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+    first = None
+    if not_found is not None:
+        first = await anext(cursor, None)
+        if first is None:
+            raise HTTPException(status_code=404, detail=not_found)
+    return StreamingResponse(ndjson_lines(cursor, first), media_type="application/x-ndjson")
+
+#exportar una coleccion en NDJSON ordenada por _id, leyendo BSON en crudo de un
+#secundario si lo hay; para reanudar se pasa en after el ultimo _id recibido
+async def export_response(collection: str, model, filter: Optional[str], fields: Optional[str], after: Optional[str]):
+    try:
+        query = parse_filter(filter)
+    except ValueError as e:
+        logger.error("Invalid export filter: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    after_id = keyset_filter(after).get("_id", {}).get("$gt")
+    fields = projection(model, fields)
+    cursor = export_collection(db, collection).find(range_filter(query, after=after_id), fields, sort=[("_id", 1)])
+    return await stream_response(cursor)
+
+#lecturas compartidas: las peticiones concurrentes con la misma consulta
+#esperan a una sola ida a Mongo y reciben el mismo resultado (no se modifica)
+async def find_all(collection: str, filter: dict, fields: Optional[dict] = None, sort=None, limit: int = 0):
+    async def run():
+        cursor = db[collection].find(filter, fields, sort=sort, limit=limit)
+        return await cursor.to_list(None)
+    return await flights.do(repr(("find", collection, filter, fields, sort, limit)), run)
+
+async def find_one_shared(collection: str, filter: dict, fields: Optional[dict] = None):
+    return await flights.do(
+        repr(("find_one", collection, filter, fields)),
+        lambda: db[collection].find_one(filter, fields),
+    )
+
+async def aggregate_all(collection: str, pipeline: list):
+    async def run():
+        cursor = await db[collection].aggregate(pipeline)
+        return await cursor.to_list(None)
+    return await flights.do(repr(("aggregate", collection, pipeline)), run)
+
+#buscar un documento por id pasando por la cache
+async def find_one_cached(collection: str, obj_id: ObjectId, fields: Optional[dict] = None):
+    # Las lecturas con proyeccion van directas a Mongo y no pasan por la cache
+    if fields is not None:
+        return await find_one_shared(collection, {"_id": obj_id}, fields)
+    key = (collection, str(obj_id))
+    doc = await cache.get(key)
+    if doc is None:
+        # La generacion se toma antes de leer, dentro de la lectura compartida:
+        # si una escritura invalida la clave mientras tanto, no se cachea
+        async def load():
+            generation = await cache.generation(key)
+            return generation, await db[collection].find_one({"_id": obj_id})
+        generation, doc = await flights.do(repr(("find_one_cached", collection, key[1])), load)
+        if doc is not None:
+            await cache.set(key, doc, generation)
+    return doc
+
+#invalidar la cache tras escribir un documento
+async def invalidate(collection: str, id: str):
+    await cache.delete((collection, id.lower()))
+
+#filas de una vista materializada, paginadas por su clave
+@app.get("/views/{view}")
+async def get_view(
+    view: str,
+    after: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    logger.info("Received request to get materialized view: %s", view)
+    definition = views.VIEWS.get(view)
+    if definition is None:
+        raise HTTPException(status_code=404, detail="View not found")
+    if definition.get("per_document"):
+        filter = keyset_filter(after)
+    else:
+        filter = {"_id": {"$gt": after}} if after is not None else {}
+    rows = await find_all(definition["target"], filter, sort=[("_id", ASCENDING)], limit=limit)
+    return page(rows, limit)
+
+#una fila de una vista materializada (curso, universidad, campo, categoria o año)
+@app.get("/views/{view}/{key}")
+async def get_view_row(view: str, key: str):
+    logger.info("Received request to get row %s of materialized view: %s", key, view)
+    definition = views.VIEWS.get(view)
+    if definition is None:
+        raise HTTPException(status_code=404, detail="View not found")
+    if definition.get("per_document"):
+        try:
+            key = ObjectId(key)
+        except Exception:
+            logger.error("Invalid ID format: %s", key)
+            raise HTTPException(status_code=400, detail="Invalid ID format")
+    row = await find_one_shared(definition["target"], {"_id": key})
+    if row is None:
+        raise HTTPException(status_code=404, detail="Row not found")
+    return MongoJSONResponse(row)
+
+#contadores de la cache de documentos
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return cache.stats()
+
+# Ids que se aceptan como maximo en una consulta por lotes
+MAX_BATCH_IDS = 200
+
+# Ids que se aceptan como maximo en un batch-get y cuantos van en cada $in
+MAX_BATCH_GET_IDS = 10000
+BATCH_GET_CHUNK_SIZE = 1000
+
+#convertir una lista de ids en ObjectIds, con un maximo por peticion
+def to_object_ids(values: list, max_ids: int) -> list:
+    if len(values) > max_ids:
+        raise HTTPException(status_code=400, detail=f"At most {max_ids} ids per request")
+    try:
+        return [ObjectId(value) for value in values]
+    except Exception:
+        logger.error("Invalid ID format in: %s", values)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+#convertir una lista de ids separados por comas en ObjectIds
+def parse_ids(ids: str) -> list:
+    return to_object_ids([value for value in ids.split(",") if value], MAX_BATCH_IDS)
+
+#buscar muchos documentos por id: primero en la cache y el resto con $in por trozos
+async def find_many_by_ids(collection: str, obj_ids: list, fields: Optional[dict] = None) -> list:
+    pending = list(dict.fromkeys(obj_ids))
+    docs = []
+    if fields is None:
+        cached = await asyncio.gather(*(cache.get((collection, str(obj_id))) for obj_id in pending))
+        docs = [doc for doc in cached if doc is not None]
+        pending = [obj_id for obj_id, doc in zip(pending, cached) if doc is None]
+    generations = {}
+    if fields is None:
+        keys = [(collection, str(obj_id)) for obj_id in pending]
+        generations = dict(zip(keys, await asyncio.gather(*(cache.generation(key) for key in keys))))
+    chunks = [pending[i:i + BATCH_GET_CHUNK_SIZE] for i in range(0, len(pending), BATCH_GET_CHUNK_SIZE)]
+    results = await asyncio.gather(*(
+        db[collection].find({"_id": {"$in": chunk}}, fields).to_list(None) for chunk in chunks
+    ))
+    for fetched in results:
+        if fields is None:
+            for doc in fetched:
+                key = (collection, str(doc["_id"]))
+                await cache.set(key, doc, generations.get(key))
+        docs.extend(fetched)
+    return docs
+
+#ordenar los documentos como los ids pedidos e indicar los que faltan
+def in_request_order(obj_ids: list, docs: list) -> dict:
+    by_id = {doc["_id"]: doc for doc in docs}
+    return {
+        "documents": [by_id[obj_id] for obj_id in obj_ids if obj_id in by_id],
+        "missing": [str(obj_id) for obj_id in obj_ids if obj_id not in by_id],
+    }
+
+#etapas de agregacion que sustituyen un array de ids por los documentos referenciados;
+#los ids mal formados se ignoran en vez de romper la consulta
+def lookup_stages(field: str, from_collection: str, fields: Optional[dict] = None) -> list:
+    lookup = {
+        "from": from_collection,
+        "localField": "_lookup_ids",
+        "foreignField": "_id",
+        "as": field,
+    }
+    if fields is not None:
+        lookup["pipeline"] = [{"$project": fields}]
+    return [
+        {"$addFields": {"_lookup_ids": {"$map": {
+            "input": {"$cond": [{"$isArray": f"${field}"}, f"${field}", []]},
+            "in": {"$convert": {"input": "$$this", "to": "objectId", "onError": None, "onNull": None}},
+        }}}},
+        {"$lookup": lookup},
+        {"$project": {"_lookup_ids": 0}},
+    ]
+
+# Limites de los recorridos del grafo de colaboraciones (patents.contributors)
+MAX_GRAPH_DEPTH = 3
+DEFAULT_GRAPH_LIMIT = 100
+MAX_GRAPH_LIMIT = 1000
+# Patentes de partida como maximo por contribuidor
+MAX_SEED_PATENTS = 500
+# Patentes leidas por salto y contribuidores que pasan al salto siguiente como maximo
+MAX_HOP_PATENTS = 2000
+MAX_GRAPH_FRONTIER = 200
+DEFAULT_NETWORK_PATENTS = 20
+MAX_NETWORK_PATENTS = 200
+
+#co-contribuidores a k saltos, salto a salto: cada salto lee las patentes de
+#la frontera con $in sobre contributors_1 y los nuevos nombres forman la
+#siguiente frontera. Las patentes por salto y el tamaño de la frontera tienen
+#tope, asi que un grafo denso no se recorre entero; truncated indica el corte
+async def co_contributors(name: str, depth: int, limit: int) -> Optional[dict]:
+    nodes = {}
+    seen = {name}
+    frontier = [name]
+    truncated = False
+    for hop in range(1, depth + 1):
+        cap = MAX_SEED_PATENTS if hop == 1 else MAX_HOP_PATENTS
+        patents = await find_all("patents", {"contributors": {"$in": frontier}}, {"_id": 0, "contributors": 1}, limit=cap)
+        if hop == 1 and not patents:
+            return None
+        if len(patents) >= cap:
+            truncated = True
+        shared = Counter(contributor for patent in patents for contributor in set(patent.get("contributors", [])))
+        reached = sorted(contributor for contributor in shared if contributor not in seen)
+        for contributor in reached:
+            nodes[contributor] = {"name": contributor, "hops": hop}
+            if hop == 1:
+                nodes[contributor]["shared_patents"] = shared[contributor]
+        seen.update(reached)
+        if len(reached) > MAX_GRAPH_FRONTIER:
+            truncated = True
+        frontier = reached[:MAX_GRAPH_FRONTIER]
+        if not frontier:
+            break
+    result = sorted(nodes.values(), key=lambda node: (node["hops"], node["name"]))
+    return {
+        "contributor": name,
+        "depth": depth,
+        "co_contributors": result[:limit],
+        "truncated": truncated or len(result) > limit,
+    }
+
+#red de una universidad: sus cientificos (universities guarda el id o el nombre)
+#con las patentes en las que aparecen como contribuidores
+async def university_network(university: dict, limit: int, patents_limit: int) -> dict:
+    scientists = await aggregate_all("scientists", [
+        {"$match": {"universities": {"$in": [str(university["_id"]), university["name"]]}}},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit + 1},
+        {"$project": {"name": 1, "category": 1, "cneaiField": 1}},
+        {"$lookup": {
+            "from": "patents",
+            "localField": "name",
+            "foreignField": "contributors",
+            "pipeline": [{"$project": {"name": 1, "date": 1}}, {"$limit": patents_limit}],
+            "as": "patents",
+        }},
+    ])
+    return {
+        "university": university,
+        "scientists": scientists[:limit],
+        "truncated": len(scientists) > limit,
+    }
+
+# Tamaño de lote por defecto y maximo de las cargas masivas
+DEFAULT_BULK_BATCH_SIZE = 1000
+MAX_BULK_BATCH_SIZE = 10000
+# Errores por fila que se devuelven como maximo en una carga masiva
+MAX_BULK_ERRORS = 1000
+
+#leer las filas de una carga masiva: array JSON o NDJSON en streaming
+async def bulk_rows(request: Request):
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+    try:
+        rows = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array")
+    for row in rows:
+        yield row
+
+#enumerar un iterador asincrono
+async def aiter_enumerate(iterator):
+    index = 0
+    async for item in iterator:
+        yield index, item
+        index += 1
+
+#insertar un lote sin orden y devolver los insertados y los errores por fila
+async def insert_batch(collection: str, docs: list, rows: list):
+    try:
+        result = await db[collection].insert_many(docs, ordered=False)
+        return len(result.inserted_ids), []
+    except BulkWriteError as e:
+        errors = [
+            {"row": rows[error["index"]], "error": error["errmsg"]}
+            for error in e.details["writeErrors"]
+        ]
+        return e.details["nInserted"], errors
+
+#carga masiva: valida por lotes y escribe cada lote mientras se valida el siguiente
+async def bulk_insert(request: Request, collection: str, model, batch_size: int):
+    batches = []
+    errors = []
+    error_count = 0
+    docs, rows = [], []
+    pending = None
+
+    async def flush():
+        nonlocal pending, error_count
+        if pending is not None:
+            batch, task = pending
+            inserted, batch_errors = await task
+            batches.append({"batch": batch, "inserted": inserted})
+            error_count += len(batch_errors)
+            errors.extend(batch_errors[:MAX_BULK_ERRORS - len(errors)])
+            pending = None
+
+    row = -1
+    async for row, raw in aiter_enumerate(bulk_rows(request)):
+        try:
+            if isinstance(raw, bytes):
+                item = model.model_validate_json(raw)
+            else:
+                item = model.model_validate(raw)
+        except ValidationError as e:
+            error_count += 1
+            if len(errors) < MAX_BULK_ERRORS:
+                errors.append({"row": row, "error": [
+                    {"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()
+                ]})
+            continue
+        docs.append({**item.model_dump(), "version": 1})
+        rows.append(row)
+        if len(docs) >= batch_size:
+            await flush()
+            pending = (len(batches), asyncio.create_task(insert_batch(collection, docs, rows)))
+            docs, rows = [], []
+    await flush()
+    if docs:
+        pending = (len(batches), asyncio.create_task(insert_batch(collection, docs, rows)))
+        await flush()
+
+    inserted = sum(batch["inserted"] for batch in batches)
+    logger.info("Bulk insert into %s: %s of %s rows inserted", collection, inserted, row + 1)
+    return {
+        "inserted": inserted,
+        "rows": row + 1,
+        "batches": batches,
+        "error_count": error_count,
+        "errors": errors,
+    }
+
+#insertar un documento; con write batching se agrupa con otras altas concurrentes
+async def insert_document(collection: str, doc: dict):
+    batcher = batchers.get(collection)
+    if batcher is not None:
+        return await batcher.insert(doc)
+    result = await db[collection].insert_one(doc)
+    return result.inserted_id
+
 #crear un estudiante
 @app.post("/students")
 async def create_student(student: Student):
-    result = db.students.insert_one( {
+    inserted_id = await insert_document("students", {
         "name": student.name,
-        "age": student.age
+        "age": student.age,
+        "version": 1
     }
     )
     return {
-        "id": str(result.inserted_id),
+        "id": str(inserted_id),
         "massage": "Student created successfully"
     }
 
+#carga masiva de estudiantes (array JSON o NDJSON)
+@app.post("/students/bulk")
+async def bulk_create_students(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+):
+    logger.info("Received request to bulk create students")
+    return await bulk_insert(request, "students", Student, batch_size)
+
 #buscar todos los estudiantes
 @app.get("/students")
-async def get_students():
+async def get_students(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    fields: Optional[str] = None,
+):
     logger.info("Received request to get all students")
-    students = list(db.students.find())
-    for student in students:
-        student["_id"] = str(student["_id"])
-    logger.info(f"Returning {len(students)} students")
-    return students
+    fields = projection(Student, fields)
+    if stream:
+        logger.info("Streaming students")
+        cursor = db.students.find(keyset_filter(after), fields, sort=[("_id", ASCENDING)], limit=limit or 0)
+        return await stream_response(cursor)
+    limit = limit or DEFAULT_PAGE_SIZE
+    students = await find_all("students", keyset_filter(after), fields, [("_id", ASCENDING)], limit)
+    logger.info("Returning %s students", len(students))
+    return page(students, limit)
 
 #buscar por nombre
 @app.get("/students/oneStudent/{name}")
-async def get_one_student(name: str):
-    logger.info(f"Received request to get one student with name: {name}")
-    student = db.students.find_one({"name": name})
+async def get_one_student(name: str, fields: Optional[str] = None):
+    logger.info("Received request to get one student with name: %s", name)
+    student = await find_one_shared("students", {"name": name}, projection(Student, fields))
     if student is None:
-        logger.warning(f"Student not found with name: {name}")
+        logger.warning("Student not found with name: %s", name)
         raise HTTPException(status_code=404, detail="Student not found")
-    student["_id"] = str(student["_id"])
-    logger.info(f"Returning student with name: {name}")
-    return student
+    logger.info("Returning student with name: %s", name)
+    return MongoJSONResponse(student)
 
 #buscar por id
 @app.get("/students/oneStudentbyId/{id}")
-async def get_one_student_by_id(id: str):
-    logger.info(f"Received request to get student by ID: {id}")
-    student = db.students.find_one({"_id": ObjectId(id)})
+async def get_one_student_by_id(id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    logger.info("Received request to get student by ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    fields = projection(Student, fields, versioned=True)
+    student = await find_one_cached("students", obj_id, fields)
     if student is None:
-        logger.warning(f"Student not found with ID: {id}")
+        logger.warning("Student not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Student not found")
-    student["_id"] = str(student["_id"])
-    logger.info(f"Returning student with ID: {id}")
-    return student
+    logger.info("Returning student with ID: %s", id)
+    return conditional_response(student, doc_etag(student, fields), if_none_match)
+
+#consultar estudiantes con filtros, orden y limite resueltos en Mongo
+@app.post("/students/query")
+async def query_students(request: QueryRequest):
+    logger.info("Received query on students: %s", request)
+    docs = await typed_query("students", Student, request)
+    logger.info("Returning %s students", len(docs))
+    return MongoJSONResponse(docs)
+
+#buscar varios estudiantes por id en una sola peticion
+@app.post("/students/batch-get")
+async def batch_get_students(ids: List[str], fields: Optional[str] = None):
+    logger.info("Received request to batch get %s students", len(ids))
+    obj_ids = to_object_ids(ids, MAX_BATCH_GET_IDS)
+    docs = await find_many_by_ids("students", obj_ids, projection(Student, fields))
+    result = in_request_order(obj_ids, docs)
+    logger.info("Returning %s students, %s missing", len(result["documents"]), len(result["missing"]))
+    return MongoJSONResponse(result)
 
 #buscar estudiantes que tengan el mismo nombre
 @app.get("/students/{name}")
-async def get_student_by_name(name: str):
-    logger.info(f"Received request to get students with name: {name}")
-    students = list(db.students.find({"name": name}))
+async def get_student_by_name(name: str, stream: bool = False, fields: Optional[str] = None):
+    logger.info("Received request to get students with name: %s", name)
+    fields = projection(Student, fields)
+    if stream:
+        logger.info("Streaming students with name: %s", name)
+        return await stream_response(db.students.find({"name": name}, fields), "Student not found")
+    students = await find_all("students", {"name": name}, fields)
     if not students:
-        logger.warning(f"No students found with name: {name}")
+        logger.warning("No students found with name: %s", name)
         raise HTTPException(status_code=404, detail="Student not found")
-    for student in students:
-        student["_id"] = str(student["_id"])
-    logger.info(f"Returning {len(students)} students with name: {name}")
-    return students
+    logger.info("Returning %s students with name: %s", len(students), name)
+    return MongoJSONResponse(students)
 
 #actualizar por id
 @app.put("/students/updateStudent/{id}")
-async def update_student(id: str, student: Student):
-    logger.info(f"Received request to update student with ID: {id}")
+async def update_student(id: str, student: Student, if_match: Optional[str] = Header(None)):
+    logger.info("Received request to update student with ID: %s", id)
     try:
         obj_id = ObjectId(id)
     except Exception:
-        logger.error(f"Invalid ID format: {id}")
+        logger.error("Invalid ID format: %s", id)
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
-    result = db.students.update_one({"_id": obj_id}, {"$set": {
+    result = await db.students.update_one({"_id": obj_id, **version_filter(if_match)}, {"$set": {
         "name": student.name,
         "age": student.age
-    }})
+    }, "$inc": {"version": 1}})
 
     if result.matched_count == 0:
-        logger.warning(f"Student not found with ID: {id}")
+        await check_precondition("students", obj_id, if_match)
+        logger.warning("Student not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Student not found")
 
-    logger.info(f"Student with ID: {id} updated successfully")
+    await invalidate("students", id)
+    logger.info("Student with ID: %s updated successfully", id)
     return {"message": "Student updated successfully"}
 
 #eliminar por id
 @app.delete("/students/deleteStudent/{id}")
 async def delete_student(id: str):
-    logger.info(f"Received request to delete student with ID: {id}")
-    result = db.students.delete_one({"_id": ObjectId(id)})
+    logger.info("Received request to delete student with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    result = await db.students.delete_one({"_id": obj_id})
+    await invalidate("students", id)
     if result.deleted_count == 0:
-        logger.warning(f"Student not found with ID: {id}")
+        logger.warning("Student not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Student not found")
-    logger.info(f"Student with ID: {id} deleted successfully")
+    logger.info("Student with ID: %s deleted successfully", id)
     return {"message": "Student deleted successfully"}
     
 #buscar todos los cursos
 @app.get("/courses")
-async def get_courses():
+async def get_courses(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    fields: Optional[str] = None,
+):
     logger.info("Received request to get all courses")
-    courses = list(db.courses.find())
-    for course in courses:
-        course["_id"] = str(course["_id"])
-    logger.info(f"Returning {len(courses)} courses")
-    return courses
+    fields = projection(Course, fields)
+    if stream:
+        logger.info("Streaming courses")
+        cursor = db.courses.find(keyset_filter(after), fields, sort=[("_id", ASCENDING)], limit=limit or 0)
+        return await stream_response(cursor)
+    limit = limit or DEFAULT_PAGE_SIZE
+    courses = await find_all("courses", keyset_filter(after), fields, [("_id", ASCENDING)], limit)
+    logger.info("Returning %s courses", len(courses))
+    return page(courses, limit)
 
 #buscar un curso por id
 @app.get("/courses/oneCourse/{id}")
-async def get_one_course(id: str):
-    logger.info(f"Received request to get one course with ID: {id}")
-    course = db.courses.find_one({"_id": ObjectId(id)})
+async def get_one_course(id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    logger.info("Received request to get one course with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    fields = projection(Course, fields, versioned=True)
+    course = await find_one_cached("courses", obj_id, fields)
 
     if course is None:
-        logger.warning(f"Course not found with ID: {id}")
+        logger.warning("Course not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Course not found")
-    course["_id"] = str(course["_id"])
-    logger.info(f"Returning course with ID: {id}")
-    return course
+    logger.info("Returning course with ID: %s", id)
+    return conditional_response(course, doc_etag(course, fields), if_none_match)
+
+#ver alumnos de varios cursos en una sola consulta
+@app.get("/courses/students")
+async def get_students_by_courses(ids: str, fields: Optional[str] = None):
+    logger.info("Received request to get students for courses: %s", ids)
+    course_obj_ids = parse_ids(ids)
+    docs = await aggregate_all("courses", [
+        {"$match": {"_id": {"$in": course_obj_ids}}},
+        *lookup_stages("alumnos", "students", projection(Student, fields)),
+    ])
+    result = in_request_order(course_obj_ids, docs)
+    logger.info("Returning students for %s courses", len(result['documents']))
+    return MongoJSONResponse(result)
+
+#consultar cursos con filtros, orden y limite resueltos en Mongo
+@app.post("/courses/query")
+async def query_courses(request: QueryRequest):
+    logger.info("Received query on courses: %s", request)
+    docs = await typed_query("courses", Course, request)
+    logger.info("Returning %s courses", len(docs))
+    return MongoJSONResponse(docs)
+
+#buscar varios cursos por id en una sola peticion
+@app.post("/courses/batch-get")
+async def batch_get_courses(ids: List[str], fields: Optional[str] = None):
+    logger.info("Received request to batch get %s courses", len(ids))
+    obj_ids = to_object_ids(ids, MAX_BATCH_GET_IDS)
+    docs = await find_many_by_ids("courses", obj_ids, projection(Course, fields))
+    result = in_request_order(obj_ids, docs)
+    logger.info("Returning %s courses, %s missing", len(result["documents"]), len(result["missing"]))
+    return MongoJSONResponse(result)
 
 #buscar cursos por nombre
 @app.get("/courses/{name}")
-async def get_course_by_name(name: str):
-    logger.info(f"Received request to get courses with name: {name}")
-    courses = list(db.courses.find({"name": name}))
+async def get_course_by_name(name: str, stream: bool = False, fields: Optional[str] = None):
+    logger.info("Received request to get courses with name: %s", name)
+    fields = projection(Course, fields)
+    if stream:
+        logger.info("Streaming courses with name: %s", name)
+        return await stream_response(db.courses.find({"name": name}, fields), "Course not found")
+    courses = await find_all("courses", {"name": name}, fields)
     if not courses:
-        logger.warning(f"No courses found with name: {name}")
+        logger.warning("No courses found with name: %s", name)
         raise HTTPException(status_code=404, detail="Course not found")
-    for course in courses:
-        course["_id"] = str(course["_id"])
-    logger.info(f"Returning {len(courses)} courses with name: {name}")
-    return courses
+    logger.info("Returning %s courses with name: %s", len(courses), name)
+    return MongoJSONResponse(courses)
 
 #crear un curso
 @app.post("/courses")
 async def create_course(course: Course):
-    logger.info(f"Received request to create a new course")
-    result = db.courses.insert_one( {
+    logger.info("Received request to create a new course")
+    result = await db.courses.insert_one( {
         "name": course.name,
         "facultad": course.facultad,
-        "alumnos": course.alumnos
+        "alumnos": course.model_dump()["alumnos"],
+        "version": 1
     }
     )
     return {
@@ -198,49 +1124,66 @@ async def create_course(course: Course):
         "message": "Course created successfully"
     }
 
+#carga masiva de cursos (array JSON o NDJSON)
+@app.post("/courses/bulk")
+async def bulk_create_courses(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+):
+    logger.info("Received request to bulk create courses")
+    return await bulk_insert(request, "courses", Course, batch_size)
+
 #actualizar un curso por id
 @app.put("/courses/updateCourse/{id}")
-async def update_course(id: str, course: Course):
-    logger.info(f"Received request to update course with ID: {id}")
+async def update_course(id: str, course: Course, if_match: Optional[str] = Header(None)):
+    logger.info("Received request to update course with ID: %s", id)
     try:
         obj_id = ObjectId(id)
     except Exception:
-        logger.error(f"Invalid ID format: {id}")
+        logger.error("Invalid ID format: %s", id)
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
-    result = db.courses.update_one({"_id": obj_id}, {"$set": {
+    result = await db.courses.update_one({"_id": obj_id, **version_filter(if_match)}, {"$set": {
         "name": course.name,
         "facultad": course.facultad,
-        "alumnos": course.alumnos
-    }})
+        "alumnos": course.model_dump()["alumnos"]
+    }, "$inc": {"version": 1}})
 
     if result.matched_count == 0:
-        logger.warning(f"Course not found with ID: {id}")
+        await check_precondition("courses", obj_id, if_match)
+        logger.warning("Course not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Course not found")
 
-    logger.info(f"Course with ID: {id} updated successfully")
+    await invalidate("courses", id)
+    logger.info("Course with ID: %s updated successfully", id)
     return {"message": "Course updated successfully"}
 
 #eliminar un curso por id
 @app.delete("/courses/deleteCourse/{id}")
 async def delete_course(id: str):
-    logger.info(f"Received request to delete course with ID: {id}")
-    result = db.courses.delete_one({"_id": ObjectId(id)})
+    logger.info("Received request to delete course with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    result = await db.courses.delete_one({"_id": obj_id})
+    await invalidate("courses", id)
     if result.deleted_count == 0:
-        logger.warning(f"Course not found with ID: {id}")
+        logger.warning("Course not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Course not found")
-    logger.info(f"Course with ID: {id} deleted successfully")
+    logger.info("Course with ID: %s deleted successfully", id)
     return {"message": "Course deleted successfully"}
 
 
 #agregar un estudiante a un curso
 @app.put("/courses/{course_id}/add_student_ids")
 async def add_student_ids_to_course(course_id: str, student_ids: List[str]):
-    logger.info(f"Received request to add student IDs to course with ID: {course_id}")
+    logger.info("Received request to add student IDs to course with ID: %s", course_id)
     try:
         course_obj_id = ObjectId(course_id)
     except Exception:
-        logger.error(f"Invalid course ID format: {course_id}")
+        logger.error("Invalid course ID format: %s", course_id)
         raise HTTPException(status_code=400, detail="Invalid course ID format")
 
     # Verificar que todos los IDs de estudiantes sean válidos
@@ -251,63 +1194,62 @@ async def add_student_ids_to_course(course_id: str, student_ids: List[str]):
         raise HTTPException(status_code=400, detail="Invalid student ID format")
 
     # Verificar que los estudiantes existan
-    existing_students = list(db.students.find({"_id": {"$in": student_obj_ids}}))
+    existing_students = await db.students.find({"_id": {"$in": student_obj_ids}}).to_list(None)
     if len(existing_students) != len(student_ids):
         logger.warning("Some student IDs do not exist")
         raise HTTPException(status_code=404, detail="Some student IDs do not exist")
 
     # Actualizar el curso agregando los IDs de los estudiantes
-    result = db.courses.update_one(
+    result = await db.courses.update_one(
         {"_id": course_obj_id},
-        {"$addToSet": {"alumnos": {"$each": student_ids}}}
+        {"$addToSet": {"alumnos": {"$each": student_ids}}, "$inc": {"version": 1}}
     )
 
     if result.matched_count == 0:
-        logger.warning(f"Course not found with ID: {course_id}")
+        logger.warning("Course not found with ID: %s", course_id)
         raise HTTPException(status_code=404, detail="Course not found")
 
-    logger.info(f"Student IDs added to course with ID: {course_id} successfully")
+    await invalidate("courses", course_id)
+    logger.info("Student IDs added to course with ID: %s successfully", course_id)
     return {"message": "Student IDs added successfully"}
 
 #ver alumnos de un curso con los atributos de los estudiantes
 @app.get("/courses/{course_id}/students")
-async def get_students_by_course(course_id: str):
-    logger.info(f"Received request to get students by course with ID: {course_id}")
-    
-    # Buscar el curso por su ID
-    course = db.courses.find_one({"_id": ObjectId(course_id)})
-    if course is None:
-        logger.warning(f"Course not found with ID: {course_id}")
+async def get_students_by_course(
+    course_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    logger.info("Received request to get students by course with ID: %s", course_id)
+
+    try:
+        course_obj_id = ObjectId(course_id)
+    except Exception:
+        logger.error("Invalid course ID format: %s", course_id)
+        raise HTTPException(status_code=400, detail="Invalid course ID format")
+
+    # Buscar el curso y sus estudiantes en una sola consulta
+    fields = projection(Student, fields, versioned=True)
+    courses = await aggregate_all("courses", [
+        {"$match": {"_id": course_obj_id}},
+        *lookup_stages("alumnos", "students", fields),
+    ])
+    if not courses:
+        logger.warning("Course not found with ID: %s", course_id)
         raise HTTPException(status_code=404, detail="Course not found")
-    
-    # Obtener los IDs de los estudiantes del curso
-    student_ids = course.get("alumnos", [])
-    
-    # Convertir los IDs a ObjectId
-    student_obj_ids = [ObjectId(student_id) for student_id in student_ids]
-    
-    # Buscar los detalles de los estudiantes
-    students = list(db.students.find({"_id": {"$in": student_obj_ids}}))
-    
-    # Convertir el _id de cada estudiante a string
-    for student in students:
-        student["_id"] = str(student["_id"])
-    
-    # Reemplazar los IDs de los estudiantes con los documentos completos
-    course["alumnos"] = students
-    course["_id"] = str(course["_id"])
-    
-    logger.info(f"Returning students for course with ID: {course_id}")
-    return course
+
+    logger.info("Returning students for course with ID: %s", course_id)
+    return conditional_response(courses[0], composite_etag(courses[0], "alumnos", fields), if_none_match)
 
 
 #crear una universidad
 @app.post("/universities")
 async def create_university(university: University):
-    logger.info(f"Received request to create a new university")
-    result = db.universities.insert_one( {
+    logger.info("Received request to create a new university")
+    result = await db.universities.insert_one( {
         "name": university.name,
-        "carreras": university.carreras
+        "carreras": university.carreras,
+        "version": 1
     }
     )
     return {
@@ -315,297 +1257,535 @@ async def create_university(university: University):
         "message": "University created successfully"
     }
 
+#carga masiva de universidades (array JSON o NDJSON)
+@app.post("/universities/bulk")
+async def bulk_create_universities(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+):
+    logger.info("Received request to bulk create universities")
+    return await bulk_insert(request, "universities", University, batch_size)
+
 #buscar una universidad por id
 @app.get("/universities/oneUniversity/{id}")
-async def get_one_university(id: str):
-    logger.info(f"Received request to get one university with ID: {id}")
-    university = db.universities.find_one({"_id": ObjectId(id)})
+async def get_one_university(id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    logger.info("Received request to get one university with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    fields = projection(University, fields, versioned=True)
+    university = await find_one_cached("universities", obj_id, fields)
     if university is None:
-        logger.warning(f"University not found with ID: {id}")
+        logger.warning("University not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="University not found")
-    university["_id"] = str(university["_id"])
-    logger.info(f"Returning university with ID: {id}")
-    return university
+    logger.info("Returning university with ID: %s", id)
+    return conditional_response(university, doc_etag(university, fields), if_none_match)
+
+#buscar carreras de varias universidades en una sola consulta
+@app.get("/universities/carreras")
+async def get_carreras_by_universities(ids: str, fields: Optional[str] = None):
+    logger.info("Received request to get carreras for universities: %s", ids)
+    university_obj_ids = parse_ids(ids)
+    docs = await aggregate_all("universities", [
+        {"$match": {"_id": {"$in": university_obj_ids}}},
+        *lookup_stages("carreras", "courses", projection(Course, fields)),
+    ])
+    result = in_request_order(university_obj_ids, docs)
+    logger.info("Returning carreras for %s universities", len(result['documents']))
+    return MongoJSONResponse(result)
+
+#consultar universidades con filtros, orden y limite resueltos en Mongo
+@app.post("/universities/query")
+async def query_universities(request: QueryRequest):
+    logger.info("Received query on universities: %s", request)
+    docs = await typed_query("universities", University, request)
+    logger.info("Returning %s universities", len(docs))
+    return MongoJSONResponse(docs)
+
+#buscar varios universidades por id en una sola peticion
+@app.post("/universities/batch-get")
+async def batch_get_universities(ids: List[str], fields: Optional[str] = None):
+    logger.info("Received request to batch get %s universities", len(ids))
+    obj_ids = to_object_ids(ids, MAX_BATCH_GET_IDS)
+    docs = await find_many_by_ids("universities", obj_ids, projection(University, fields))
+    result = in_request_order(obj_ids, docs)
+    logger.info("Returning %s universities, %s missing", len(result["documents"]), len(result["missing"]))
+    return MongoJSONResponse(result)
 
 #buscar una universidad por nombre
 @app.get("/universities/{name}")
-async def get_university_by_name(name: str):
-    logger.info(f"Received request to get universities with name: {name}")
-    universities = list(db.universities.find({"name": name}))
+async def get_university_by_name(name: str, stream: bool = False, fields: Optional[str] = None):
+    logger.info("Received request to get universities with name: %s", name)
+    fields = projection(University, fields)
+    if stream:
+        logger.info("Streaming universities with name: %s", name)
+        return await stream_response(db.universities.find({"name": name}, fields), "University not found")
+    universities = await find_all("universities", {"name": name}, fields)
     if not universities:
-        logger.warning(f"No universities found with name: {name}")
+        logger.warning("No universities found with name: %s", name)
         raise HTTPException(status_code=404, detail="University not found")
-    for university in universities:
-        university["_id"] = str(university["_id"])
-    logger.info(f"Returning {len(universities)} universities with name: {name}")
-    return universities
+    logger.info("Returning %s universities with name: %s", len(universities), name)
+    return MongoJSONResponse(universities)
 
 #actualizar una universidad por id
 @app.put("/universities/updateUniversity/{id}")
-async def update_university(id: str, university: University):
-    logger.info(f"Received request to update university with ID: {id}")
+async def update_university(id: str, university: University, if_match: Optional[str] = Header(None)):
+    logger.info("Received request to update university with ID: %s", id)
     try:
         obj_id = ObjectId(id)
     except Exception:
-        logger.error(f"Invalid ID format: {id}")
+        logger.error("Invalid ID format: %s", id)
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
-    result = db.universities.update_one({"_id": obj_id}, {"$set": {
+    result = await db.universities.update_one({"_id": obj_id, **version_filter(if_match)}, {"$set": {
         "name": university.name,
         "carreras": university.carreras
-    }})
+    }, "$inc": {"version": 1}})
 
     if result.matched_count == 0:
-        logger.warning(f"University not found with ID: {id}")
+        await check_precondition("universities", obj_id, if_match)
+        logger.warning("University not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="University not found")
 
-    logger.info(f"University with ID: {id} updated successfully")
+    await invalidate("universities", id)
+    logger.info("University with ID: %s updated successfully", id)
     return {"message": "University updated successfully"}
 
 #eliminar una universidad por id
 @app.delete("/universities/deleteUniversity/{id}")
 async def delete_university(id: str):
-    logger.info(f"Received request to delete university with ID: {id}")
-    result = db.universities.delete_one({"_id": ObjectId(id)})
+    logger.info("Received request to delete university with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    result = await db.universities.delete_one({"_id": obj_id})
+    await invalidate("universities", id)
     if result.deleted_count == 0:
-        logger.warning(f"University not found with ID: {id}")
+        logger.warning("University not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="University not found")
-    logger.info(f"University with ID: {id} deleted successfully")
+    logger.info("University with ID: %s deleted successfully", id)
     return {"message": "University deleted successfully"}
 
 
 #agregar una carrera a una universidad
 @app.put("/universities/{university_id}/add")
 async def add_carrera_to_university(university_id: str, carrera_ids: List[str]):
-    logger.info(f"Received request to add carreras to university with ID: {university_id}")
+    logger.info("Received request to add carreras to university with ID: %s", university_id)
 
     try:
         university_obj_id = ObjectId(university_id)
     except Exception:           
-        logger.error(f"Invalid university ID format: {university_id}")
+        logger.error("Invalid university ID format: %s", university_id)
         raise HTTPException(status_code=400, detail="Invalid university ID format")
 
+    # Verificar que todos los IDs de carreras sean validos
+    try:
+        carrera_obj_ids = [ObjectId(carrera_id) for carrera_id in carrera_ids]
+    except Exception:
+        logger.error("One or more carrera IDs are invalid")
+        raise HTTPException(status_code=400, detail="Invalid carrera ID format")
+
     # Verificar que la universidad exista
-    university = db.universities.find_one({"_id": university_obj_id})
+    university = await db.universities.find_one({"_id": university_obj_id})
     if university is None:
-        logger.warning(f"University not found with ID: {university_id}")
+        logger.warning("University not found with ID: %s", university_id)
         raise HTTPException(status_code=404, detail="University not found")
 
     # Verificar que las carreras existan
-    carrera_obj_ids = [ObjectId(carrera_id) for carrera_id in carrera_ids]
-    existing_carreras = list(db.courses.find({"_id": {"$in": carrera_obj_ids}}))
+    existing_carreras = await db.courses.find({"_id": {"$in": carrera_obj_ids}}).to_list(None)
 
     if len(existing_carreras) != len(carrera_ids):
         logger.warning("Some carreras IDs do not exist")
         raise HTTPException(status_code=404, detail="Some carrera IDs do not exist")
 
     # Agregar las carreras a la universidad
-    result = db.universities.update_one(
+    result = await db.universities.update_one(
         {"_id": university_obj_id},
-        {"$addToSet": {"carreras": {"$each": carrera_ids}}}
+        {"$addToSet": {"carreras": {"$each": carrera_ids}}, "$inc": {"version": 1}}
     )
 
     if result.matched_count == 0:
-        logger.warning(f"University not found with ID: {university_id}")
+        logger.warning("University not found with ID: %s", university_id)
         raise HTTPException(status_code=404, detail="University not found")
 
-    logger.info(f"Carreras added to university with ID: {university_id} successfully")
+    await invalidate("universities", university_id)
+    logger.info("Carreras added to university with ID: %s successfully", university_id)
     return {"message": "Carreras added successfully"}
 
 
 #buscar carreras de una universidad por sus atributos
 @app.get("/universities/{university_id}/carreras")
-async def get_carreras_by_university(university_id: str):
-    logger.info(f"Received request to get carreras by university with ID: {university_id}")
+async def get_carreras_by_university(
+    university_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    logger.info("Received request to get carreras by university with ID: %s", university_id)
 
     try:
         university_obj_id = ObjectId(university_id)
     except Exception:
-        logger.error(f"Invalid university ID format: {university_id}")
+        logger.error("Invalid university ID format: %s", university_id)
         raise HTTPException(status_code=400, detail="Invalid university ID format")
 
-    # Buscar la universidad por su ID
-    university = db.universities.find_one({"_id": university_obj_id})
-    if university is None:
-        logger.warning(f"University not found with ID: {university_id}")
+    # Buscar la universidad y sus carreras en una sola consulta
+    fields = projection(Course, fields, versioned=True)
+    universities = await aggregate_all("universities", [
+        {"$match": {"_id": university_obj_id}},
+        *lookup_stages("carreras", "courses", fields),
+    ])
+    if not universities:
+        logger.warning("University not found with ID: %s", university_id)
         raise HTTPException(status_code=404, detail="University not found")
 
-    # Obtener los IDs de las carreras de la universidad
-    carrera_ids = university.get("carreras", [])
+    logger.info("Returning carreras for university with ID: %s", university_id)
+    return conditional_response(universities[0], composite_etag(universities[0], "carreras", fields), if_none_match)
 
-    # Convertir los IDs a ObjectId
-    carrera_obj_ids = [ObjectId(carrera_id) for carrera_id in carrera_ids]
+#red de cientificos de una universidad y sus patentes
+@app.get("/universities/{university_id}/network")
+async def get_university_network(
+    university_id: str,
+    limit: int = Query(DEFAULT_GRAPH_LIMIT, ge=1, le=MAX_GRAPH_LIMIT),
+    patents_limit: int = Query(DEFAULT_NETWORK_PATENTS, ge=0, le=MAX_NETWORK_PATENTS),
+):
+    logger.info("Received request to get network of university with ID: %s", university_id)
 
-    # Buscar los detalles de las carreras
-    carreras = list(db.courses.find({"_id": {"$in": carrera_obj_ids}}))
-
-    # Convertir el _id de cada carrera a string
-    for carrera in carreras:
-        carrera["_id"] = str(carrera["_id"])
+    try:
+        university_obj_id = ObjectId(university_id)
+    except Exception:
+        logger.error("Invalid university ID format: %s", university_id)
+        raise HTTPException(status_code=400, detail="Invalid university ID format")
 
-    # Reemplazar los IDs de las carreras con los documentos completos
-    university["carreras"] = carreras
-    university["_id"] = str(university["_id"])
+    university = await find_one_shared("universities", {"_id": university_obj_id}, {"name": 1})
+    if university is None:
+        logger.warning("University not found with ID: %s", university_id)
+        raise HTTPException(status_code=404, detail="University not found")
 
-    logger.info(f"Returning carreras for university with ID: {university_id}")
-    return university
+    network = await university_network(university, limit, patents_limit)
+    logger.info("Returning %s scientists for university with ID: %s", len(network["scientists"]), university_id)
+    return MongoJSONResponse(network)
 
 #crear un cientifico
 @app.post("/scientists")
 async def create_scientist(scientist: Scientists):
-    logger.info(f"Received request to create a new scientist")
-    result = db.scientists.insert_one( {
+    logger.info("Received request to create a new scientist")
+    inserted_id = await insert_document("scientists", {
         "name": scientist.name,
         "email": scientist.email,
         "category": scientist.category,
         "cneaiField": scientist.cneaiField,
-        "universities": scientist.universities
+        "universities": scientist.universities,
+        "version": 1
     }
     )
     return {
-        "id": str(result.inserted_id),
+        "id": str(inserted_id),
         "message": "Scientist created successfully"
     }
     
+#carga masiva de cientificos (array JSON o NDJSON)
+@app.post("/scientists/bulk")
+async def bulk_create_scientists(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+):
+    logger.info("Received request to bulk create scientists")
+    return await bulk_insert(request, "scientists", Scientists, batch_size)
+
 #buscar un cientifico por id
 @app.get("/scientists/oneScientist/{id}")
-async def get_one_scientist(id: str):
-    logger.info(f"Received request to get one scientist with ID: {id}")
-    scientist = db.scientists.find_one({"_id": ObjectId(id)})
+async def get_one_scientist(id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    logger.info("Received request to get one scientist with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    fields = projection(Scientists, fields, versioned=True)
+    scientist = await find_one_cached("scientists", obj_id, fields)
     if scientist is None:
-        logger.warning(f"Scientist not found with ID: {id}")
+        logger.warning("Scientist not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Scientist not found")
-    scientist["_id"] = str(scientist["_id"])
-    logger.info(f"Returning scientist with ID: {id}")
-    return scientist
+    logger.info("Returning scientist with ID: %s", id)
+    return conditional_response(scientist, doc_etag(scientist, fields), if_none_match)
+
+#consultar cientificos con filtros, orden y limite resueltos en Mongo
+@app.post("/scientists/query")
+async def query_scientists(request: QueryRequest):
+    logger.info("Received query on scientists: %s", request)
+    docs = await typed_query("scientists", Scientists, request)
+    logger.info("Returning %s scientists", len(docs))
+    return MongoJSONResponse(docs)
+
+#buscar varios cientificos por id en una sola peticion
+@app.post("/scientists/batch-get")
+async def batch_get_scientists(ids: List[str], fields: Optional[str] = None):
+    logger.info("Received request to batch get %s scientists", len(ids))
+    obj_ids = to_object_ids(ids, MAX_BATCH_GET_IDS)
+    docs = await find_many_by_ids("scientists", obj_ids, projection(Scientists, fields))
+    result = in_request_order(obj_ids, docs)
+    logger.info("Returning %s scientists, %s missing", len(result["documents"]), len(result["missing"]))
+    return MongoJSONResponse(result)
+
+#exportar cientificos en NDJSON (filtro opcional en Extended JSON)
+@app.get("/scientists/export")
+async def export_scientists(filter: Optional[str] = None, fields: Optional[str] = None, after: Optional[str] = None):
+    logger.info("Received request to export scientists")
+    return await export_response("scientists", Scientists, filter, fields, after)
+
+#buscar cientificos por texto, ordenados por relevancia
+@app.get("/scientists/search")
+async def search_scientists(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    skip: int = Query(0, ge=0, le=MAX_SEARCH_SKIP),
+    fields: Optional[str] = None,
+):
+    logger.info("Received request to search scientists: %s", q)
+    scientists = await text_search("scientists", q, limit, skip, projection(Scientists, fields))
+    logger.info("Returning %s scientists for search: %s", len(scientists), q)
+    return MongoJSONResponse(scientists)
+
+#autocompletar nombres de cientificos por prefijo
+@app.get("/scientists/autocomplete")
+async def autocomplete_scientists(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    skip: int = Query(0, ge=0, le=MAX_SEARCH_SKIP),
+):
+    logger.info("Received request to autocomplete scientists: %s", prefix)
+    scientists = await autocomplete("scientists", prefix, limit, skip)
+    return MongoJSONResponse(scientists)
+
+#co-contribuidores de un cientifico a distancia de hasta depth patentes
+@app.get("/scientists/co-contributors")
+async def get_co_contributors(
+    name: str = Query(..., min_length=1),
+    depth: int = Query(1, ge=1, le=MAX_GRAPH_DEPTH),
+    limit: int = Query(DEFAULT_GRAPH_LIMIT, ge=1, le=MAX_GRAPH_LIMIT),
+):
+    logger.info("Received request to get co-contributors of %s within %s hops", name, depth)
+    result = await co_contributors(name, depth, limit)
+    if result is None:
+        logger.warning("No patents found for contributor: %s", name)
+        raise HTTPException(status_code=404, detail="Contributor not found")
+    logger.info("Returning %s co-contributors of %s", len(result["co_contributors"]), name)
+    return MongoJSONResponse(result)
 
 #buscar un cientifico por nombre
 @app.get("/scientists/{name}")
-async def get_scientist_by_name(name: str):
-    logger.info(f"Received request to get scientists with name: {name}")
-    scientists = list(db.scientists.find({"name": name}))
+async def get_scientist_by_name(name: str, stream: bool = False, fields: Optional[str] = None):
+    logger.info("Received request to get scientists with name: %s", name)
+    fields = projection(Scientists, fields)
+    if stream:
+        logger.info("Streaming scientists with name: %s", name)
+        return await stream_response(db.scientists.find({"name": name}, fields), "Scientist not found")
+    scientists = await find_all("scientists", {"name": name}, fields)
     if not scientists:
-        logger.warning(f"No scientists found with name: {name}")
+        logger.warning("No scientists found with name: %s", name)
         raise HTTPException(status_code=404, detail="Scientist not found")
-    for scientist in scientists:
-        scientist["_id"] = str(scientist["_id"])
-    logger.info(f"Returning {len(scientists)} scientists with name: {name}")
-    return scientists
+    logger.info("Returning %s scientists with name: %s", len(scientists), name)
+    return MongoJSONResponse(scientists)
 
 #actualizar un cientifico por id
 @app.put("/scientists/updateScientist/{id}")
-async def update_scientist(id: str, scientist: Scientists):
-    logger.info(f"Received request to update scientist with ID: {id}")
+async def update_scientist(id: str, scientist: Scientists, if_match: Optional[str] = Header(None)):
+    logger.info("Received request to update scientist with ID: %s", id)
     try:
         obj_id = ObjectId(id)
     except Exception:
-        logger.error(f"Invalid ID format: {id}")
+        logger.error("Invalid ID format: %s", id)
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
-    result = db.scientists.update_one({"_id": obj_id}, {"$set": {
+    result = await db.scientists.update_one({"_id": obj_id, **version_filter(if_match)}, {"$set": {
         "name": scientist.name,
         "email": scientist.email,
         "category": scientist.category,
         "cneaiField": scientist.cneaiField,
         "universities": scientist.universities
-    }})
+    }, "$inc": {"version": 1}})
 
     if result.matched_count == 0:
-        logger.warning(f"Scientist not found with ID: {id}")
+        await check_precondition("scientists", obj_id, if_match)
+        logger.warning("Scientist not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Scientist not found")
 
-    logger.info(f"Scientist with ID: {id} updated successfully")
+    await invalidate("scientists", id)
+    logger.info("Scientist with ID: %s updated successfully", id)
     return {"message": "Scientist updated successfully"}
 
 #eliminar un cientifico por id
 @app.delete("/scientists/deleteScientist/{id}")
 async def delete_scientist(id: str):
-    logger.info(f"Received request to delete scientist with ID: {id}")
-    result = db.scientists.delete_one({"_id": ObjectId(id)})
+    logger.info("Received request to delete scientist with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    result = await db.scientists.delete_one({"_id": obj_id})
+    await invalidate("scientists", id)
     if result.deleted_count == 0:
-        logger.warning(f"Scientist not found with ID: {id}")
+        logger.warning("Scientist not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Scientist not found")
-    logger.info(f"Scientist with ID: {id} deleted successfully")
+    logger.info("Scientist with ID: %s deleted successfully", id)
     return {"message": "Scientist deleted successfully"}
 
 #crear una patente
 @app.post("/patents")
 async def create_patent(patent: Patents):
-    logger.info(f"Received request to create a new patent")
-    result = db.patents.insert_one( {
+    logger.info("Received request to create a new patent")
+    inserted_id = await insert_document("patents", {
         "name": patent.name,
         "contributors": patent.contributors,
         "date": patent.date,
         "uri": patent.uri,
         "url": patent.url,
-        "summary": patent.summary
+        "summary": patent.summary,
+        "version": 1
     }
     )
     return {
-        "id": str(result.inserted_id),
+        "id": str(inserted_id),
         "message": "Patent created successfully"
     }
 
+#carga masiva de patentes (array JSON o NDJSON)
+@app.post("/patents/bulk")
+async def bulk_create_patents(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+):
+    logger.info("Received request to bulk create patents")
+    return await bulk_insert(request, "patents", Patents, batch_size)
+
 #buscar una patente por id
 @app.get("/patents/onePatent/{id}")
-async def get_one_patent(id: str):
-    logger.info(f"Received request to get one patent with ID: {id}")
-    patent = db.patents.find_one({"_id": ObjectId(id)})
+async def get_one_patent(id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    logger.info("Received request to get one patent with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    fields = projection(Patents, fields, versioned=True)
+    patent = await find_one_cached("patents", obj_id, fields)
     if patent is None:
-        logger.warning(f"Patent not found with ID: {id}")
+        logger.warning("Patent not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Patent not found")
-    patent["_id"] = str(patent["_id"])
-    logger.info(f"Returning patent with ID: {id}")
-    return patent
+    logger.info("Returning patent with ID: %s", id)
+    return conditional_response(patent, doc_etag(patent, fields), if_none_match)
+
+#consultar patentes con filtros, orden y limite resueltos en Mongo
+@app.post("/patents/query")
+async def query_patents(request: QueryRequest):
+    logger.info("Received query on patents: %s", request)
+    docs = await typed_query("patents", Patents, request)
+    logger.info("Returning %s patents", len(docs))
+    return MongoJSONResponse(docs)
+
+#buscar varios patentes por id en una sola peticion
+@app.post("/patents/batch-get")
+async def batch_get_patents(ids: List[str], fields: Optional[str] = None):
+    logger.info("Received request to batch get %s patents", len(ids))
+    obj_ids = to_object_ids(ids, MAX_BATCH_GET_IDS)
+    docs = await find_many_by_ids("patents", obj_ids, projection(Patents, fields))
+    result = in_request_order(obj_ids, docs)
+    logger.info("Returning %s patents, %s missing", len(result["documents"]), len(result["missing"]))
+    return MongoJSONResponse(result)
+
+#exportar patentes en NDJSON (filtro opcional en Extended JSON)
+@app.get("/patents/export")
+async def export_patents(filter: Optional[str] = None, fields: Optional[str] = None, after: Optional[str] = None):
+    logger.info("Received request to export patents")
+    return await export_response("patents", Patents, filter, fields, after)
+
+#buscar patentes por texto, ordenadas por relevancia
+@app.get("/patents/search")
+async def search_patents(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    skip: int = Query(0, ge=0, le=MAX_SEARCH_SKIP),
+    fields: Optional[str] = None,
+):
+    logger.info("Received request to search patents: %s", q)
+    patents = await text_search("patents", q, limit, skip, projection(Patents, fields))
+    logger.info("Returning %s patents for search: %s", len(patents), q)
+    return MongoJSONResponse(patents)
+
+#autocompletar nombres de patentes por prefijo
+@app.get("/patents/autocomplete")
+async def autocomplete_patents(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    skip: int = Query(0, ge=0, le=MAX_SEARCH_SKIP),
+):
+    logger.info("Received request to autocomplete patents: %s", prefix)
+    patents = await autocomplete("patents", prefix, limit, skip)
+    return MongoJSONResponse(patents)
 
 #buscar una patente por nombre
 @app.get("/patents/{name}")
-async def get_patent_by_name(name: str):
-    logger.info(f"Received request to get patents with name: {name}")
-    patents = list(db.patents.find({"name": name}))
+async def get_patent_by_name(name: str, stream: bool = False, fields: Optional[str] = None):
+    logger.info("Received request to get patents with name: %s", name)
+    fields = projection(Patents, fields)
+    if stream:
+        logger.info("Streaming patents with name: %s", name)
+        return await stream_response(db.patents.find({"name": name}, fields), "Patent not found")
+    patents = await find_all("patents", {"name": name}, fields)
     if not patents:
-        logger.warning(f"No patents found with name: {name}")
+        logger.warning("No patents found with name: %s", name)
         raise HTTPException(status_code=404, detail="Patent not found")
-    for patent in patents:
-        patent["_id"] = str(patent["_id"])
-    logger.info(f"Returning {len(patents)} patents with name: {name}")
-    return patents
+    logger.info("Returning %s patents with name: %s", len(patents), name)
+    return MongoJSONResponse(patents)
 
 #actualizar una patente por id
 @app.put("/patents/updatePatent/{id}")
-async def update_patent(id: str, patent: Patents):
-    logger.info(f"Received request to update patent with ID: {id}")
+async def update_patent(id: str, patent: Patents, if_match: Optional[str] = Header(None)):
+    logger.info("Received request to update patent with ID: %s", id)
     try:
         obj_id = ObjectId(id)
     except Exception:   
-        logger.error(f"Invalid ID format: {id}")
+        logger.error("Invalid ID format: %s", id)
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
-    result = db.patents.update_one({"_id": obj_id}, {"$set": {
+    result = await db.patents.update_one({"_id": obj_id, **version_filter(if_match)}, {"$set": {
         "name": patent.name,
         "contributors": patent.contributors,
         "date": patent.date,
         "uri": patent.uri,
         "url": patent.url,
         "summary": patent.summary
-    }})
+    }, "$inc": {"version": 1}})
 
     if result.matched_count == 0:
-        logger.warning(f"Patent not found with ID: {id}")
+        await check_precondition("patents", obj_id, if_match)
+        logger.warning("Patent not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Patent not found")
 
-    logger.info(f"Patent with ID: {id} updated successfully")
+    await invalidate("patents", id)
+    logger.info("Patent with ID: %s updated successfully", id)
     return {"message": "Patent updated successfully"}
 
 #eliminar una patente por id
 @app.delete("/patents/deletePatent/{id}")
 async def delete_patent(id: str):
-    logger.info(f"Received request to delete patent with ID: {id}")
-    result = db.patents.delete_one({"_id": ObjectId(id)})
+    logger.info("Received request to delete patent with ID: %s", id)
+    try:
+        obj_id = ObjectId(id)
+    except Exception:
+        logger.error("Invalid ID format: %s", id)
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    result = await db.patents.delete_one({"_id": obj_id})
+    await invalidate("patents", id)
     if result.deleted_count == 0:
-        logger.warning(f"Patent not found with ID: {id}")
+        logger.warning("Patent not found with ID: %s", id)
         raise HTTPException(status_code=404, detail="Patent not found")
-    logger.info(f"Patent with ID: {id} deleted successfully")
+    logger.info("Patent with ID: %s deleted successfully", id)
     return {"message": "Patent deleted successfully"}
 
 
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import logging
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def _render_histogram(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(BUCKETS, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+# Process-wide registry of request and Mongo command metrics. Everything runs
+# on the event loop thread, so plain dicts and ints are enough.
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = {}  # (method, route, status) -> count
+        self.request_latency = {}  # (method, route) -> Histogram
+        self.mongo_latency = {}  # (collection, command) -> Histogram
+        self.mongo_failures = {}  # (collection, command) -> count
+        self.gauges = {}  # name -> (help, kind, callable)
+
+    def observe_request(self, method, route, status, seconds):
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.request_latency.get((method, route))
+        if histogram is None:
+            histogram = self.request_latency[(method, route)] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_command(self, collection, command, seconds, failed=False):
+        histogram = self.mongo_latency.get((collection, command))
+        if histogram is None:
+            histogram = self.mongo_latency[(collection, command)] = Histogram()
+        histogram.observe(seconds)
+        if failed:
+            key = (collection, command)
+            self.mongo_failures[key] = self.mongo_failures.get(key, 0) + 1
+
+    def register_gauge(self, name, help, fn, kind="gauge"):
+        # fn is called at scrape time and must return a number; kind is the
+        # Prometheus type, "counter" for values that only grow
+        self.gauges[name] = (help, kind, fn)
+
+    def gauge_values(self):
+        # name -> (help, kind, value), read from the registered callables
+        values = {}
+        for name, (help, kind, fn) in self.gauges.items():
+            try:
+                values[name] = (help, kind, fn())
+            except Exception as e:
+                logger.warning(f"Could not read gauge {name}: {e}")
+        return values
+
+    def snapshot(self):
+        # JSON-serializable copy of every series, for aggregation across workers
+        return {
+            "pid": os.getpid(),
+            "in_flight": self.in_flight,
+            "requests": [[*key, count] for key, count in self.requests.items()],
+            "request_latency": [[*key, h.counts, h.sum, h.count] for key, h in self.request_latency.items()],
+            "mongo_latency": [[*key, h.counts, h.sum, h.count] for key, h in self.mongo_latency.items()],
+            "mongo_failures": [[*key, count] for key, count in self.mongo_failures.items()],
+            "gauges": self.gauge_values(),
+        }
+
+    def render(self, gauge_values=None):
+        # Prometheus text exposition format
+        if gauge_values is None:
+            gauge_values = self.gauge_values()
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Requests served by method, route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by method and route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.request_latency.items()):
+            _render_histogram(lines, "http_request_duration_seconds", _labels(method=method, route=route), histogram)
+        lines += [
+            "# HELP mongo_command_duration_seconds Mongo command latency by collection and command.",
+            "# TYPE mongo_command_duration_seconds histogram",
+        ]
+        for (collection, command), histogram in sorted(self.mongo_latency.items()):
+            _render_histogram(lines, "mongo_command_duration_seconds", _labels(collection=collection, command=command), histogram)
+        lines += [
+            "# HELP mongo_command_failures_total Failed Mongo commands by collection and command.",
+            "# TYPE mongo_command_failures_total counter",
+        ]
+        for (collection, command), count in sorted(self.mongo_failures.items()):
+            lines.append(f"mongo_command_failures_total{{{_labels(collection=collection, command=command)}}} {count}")
+        for name, (help, kind, value) in gauge_values.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge_histogram(histograms, key, counts, total, count):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram()
+    histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+    histogram.sum += total
+    histogram.count += count
+
+
+def write_snapshot(directory, registry=metrics):
+# Publish this worker's metrics as <directory>/<pid>.json
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def render_all(directory, registry=metrics):
+# Render the sum of every worker's snapshot. Counters and histograms of
+# workers that exited are kept so totals never go backwards; gauges and
+# in-flight requests only count live workers.
+    write_snapshot(directory, registry)
+    merged = Metrics()
+    gauge_values = {}
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        alive = _alive(snapshot["pid"])
+        if alive:
+            merged.in_flight += snapshot["in_flight"]
+        for *key, count in snapshot["requests"]:
+            key = tuple(key)
+            merged.requests[key] = merged.requests.get(key, 0) + count
+        for method, route, counts, total, count in snapshot["request_latency"]:
+            _merge_histogram(merged.request_latency, (method, route), counts, total, count)
+        for collection, command, counts, total, count in snapshot["mongo_latency"]:
+            _merge_histogram(merged.mongo_latency, (collection, command), counts, total, count)
+        for *key, count in snapshot["mongo_failures"]:
+            key = tuple(key)
+            merged.mongo_failures[key] = merged.mongo_failures.get(key, 0) + count
+        for name, (help, kind, value) in snapshot["gauges"].items():
+            if kind != "counter" and not alive:
+                continue
+            previous = gauge_values.get(name, (help, kind, 0))[2]
+            gauge_values[name] = (help, kind, previous + value)
+    return merged.render(gauge_values)
+
+
+# Pure ASGI middleware: records latency, status and in-flight requests per
+# route template. The route is read from the scope after routing, so paths
+# with ids collapse into one series.
+class MetricsMiddleware:
+    def __init__(self, app, registry=metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry = self.registry
+        registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.in_flight -= 1
+            route = scope.get("route")
+            registry.observe_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - start,
+            )
+
+
+class CommandMetrics(monitoring.CommandListener):
+    # Times every Mongo command by collection through pymongo command monitoring
+
+    def __init__(self, registry=metrics):
+        self.registry = registry
+        self._collections = {}  # (connection_id, request_id) -> collection
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            target = event.command.get("collection", event.database_name)
+        self._collections[(event.connection_id, event.request_id)] = target
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.registry.observe_command(collection, event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.registry.observe_command(collection, event.command_name, event.duration_micros / 1e6, failed=True)
+
+
+command_metrics = CommandMetrics()
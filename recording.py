@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import atexit
+import random
+import hashlib
+import logging
+import threading
+from queue import SimpleQueue, Empty
+from urllib.parse import parse_qsl
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def _params(query_string):
+    params = {}
+    for key, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+        if key in params:
+            current = params[key]
+            params[key] = [*current, value] if isinstance(current, list) else [current, value]
+        else:
+            params[key] = value
+    return params
+
+
+# Appends records to an NDJSON file from a background thread. The request path
+# only puts a dict on a queue; encoding and the (batched, O_APPEND) writes
+# happen on the writer thread, which is started lazily in each worker process.
+class RecordWriter:
+    def __init__(self, path, flush_interval=1.0, max_pending=100_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.queue = SimpleQueue()
+        self.pending = 0
+        self.dropped = 0
+        self.written = 0
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # pending is changed by the request path and the writer thread
+        self._count_lock = threading.Lock()
+
+    def put(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        if self.pending >= self.max_pending:
+            # The disk cannot keep up: drop records rather than grow memory
+            self.dropped += 1
+            return
+        with self._count_lock:
+            self.pending += 1
+        self.queue.put(record)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker gets a fresh queue and its own writer thread
+            self.queue = SimpleQueue()
+            self.pending = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="request-recorder", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _drain(self):
+        lines = []
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except Empty:
+                break
+            raw = record.pop("_body", None)
+            if raw is not None:
+                # JSON bodies are stored as JSON so they replay as they came;
+                # anything else (NDJSON bulk loads) as text
+                try:
+                    record["body"] = json.loads(raw)
+                except ValueError:
+                    record["body_raw"] = raw.decode("utf-8", "replace")
+            lines.append(dumps(record))
+        if lines:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, b"\n".join(lines) + b"\n")
+            finally:
+                os.close(fd)
+            with self._count_lock:
+                self.pending -= len(lines)
+            self.written += len(lines)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Could not write recorded requests to %s: %s", self.path, e)
+
+    def flush(self):
+        with self._lock:
+            self._drain()
+
+    def stats(self):
+        return {"pending": self.pending, "written": self.written, "dropped": self.dropped}
+
+
+# Pure ASGI middleware that records a sample of requests in the replay format
+# of bench/harness.py: endpoint (route template), method, path, params, body
+# hash and size, status and timing. Bodies are kept only when asked for and
+# below a size limit, since they can hold personal data.
+class RecordingMiddleware:
+    def __init__(self, app, writer, sample_rate=1.0, bodies=False, max_body=65536):
+        self.app = app
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.bodies = bodies
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        digest = hashlib.sha256()
+        size = 0
+        chunks = [] if self.bodies else None
+        status = 500
+
+        async def receive_recorded():
+            nonlocal size, chunks
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                digest.update(body)
+                size += len(body)
+                if chunks is not None:
+                    if size <= self.max_body:
+                        chunks.append(body)
+                    else:
+                        chunks = None
+            return message
+
+        async def send_recorded(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        ts = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_recorded, send_recorded)
+        finally:
+            duration = time.perf_counter() - start
+            route = scope.get("route")
+            record = {
+                "ts": ts,
+                "endpoint": f"{scope['method']} {route.path if route is not None else scope['path']}",
+                "method": scope["method"],
+                "path": scope["path"],
+                "params": _params(scope["query_string"]),
+                "body_size": size,
+                "body_sha256": digest.hexdigest() if size else None,
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+            }
+            if chunks is not None and size:
+                record["_body"] = b"".join(chunks)
+                for name, value in scope["headers"]:
+                    if name == b"content-type":
+                        record["headers"] = {"content-type": value.decode("latin-1")}
+            self.writer.put(record)
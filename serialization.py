@@ -0,0 +1,40 @@
+import datetime
+import json
+
+from bson import ObjectId, Decimal128
+from bson.raw_bson import RawBSONDocument
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+
+def _default(value):
+    # Encode the BSON types the JSON encoder does not know about
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, RawBSONDocument):
+        return dict(value.items())
+    if isinstance(value, Decimal128):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+# JSON response that encodes Mongo documents directly, without the
+# jsonable_encoder pass FastAPI runs over plain return values. Handlers
+# return it explicitly so FastAPI hands the documents straight to render().
+class MongoJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,217 @@
+# Multi-process server: a preforking master that binds the socket once and
+# forks one uvicorn worker per core. Workers import main (and create their
+# Mongo client in the lifespan handler) only after the fork.
+#
+#   python serve.py --port 8000 --workers 8
+#
+# Signals: SIGHUP restarts the workers one by one (each old worker drains its
+# in-flight requests before exiting, so reloads drop nothing and pick up new
+# code); SIGTERM/SIGINT drain every worker and stop; workers that die are
+# replaced.
+#
+# The document cache is shared through Redis (REDIS_URL) or turned off when
+# there are several workers, and /metrics always reports all of them.
+import argparse
+import atexit
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+logger = logging.getLogger("serve")
+
+
+# Document cache backends that live inside one process
+PER_PROCESS_CACHES = ("local", "memory-redis")
+
+
+def default_workers():
+    return int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def configure_cache(workers):
+# With several workers a per-process cache would keep serving a document
+# another worker just updated, so use Redis when there is one and no cache
+# otherwise; an explicit per-process backend is a configuration error
+    if workers <= 1:
+        return
+    backend = os.getenv("CACHE_BACKEND")
+    if backend in PER_PROCESS_CACHES:
+        raise SystemExit(f"CACHE_BACKEND={backend} is per process and cannot be used with {workers} workers; "
+                         "use CACHE_BACKEND=redis or CACHE_BACKEND=none")
+    if backend is None:
+        backend = "redis" if os.getenv("REDIS_URL") else "none"
+        os.environ["CACHE_BACKEND"] = backend
+        if backend == "none":
+            logger.warning("REDIS_URL is not set: the document cache is disabled for %s workers", workers)
+
+
+def _exit_worker(signum, frame):
+    raise SystemExit(0)
+
+
+class Master:
+    def __init__(self, app, host, port, workers, graceful_timeout):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children = {}  # pid -> worker index
+        self.socket = None
+        self.stopping = False
+        self.reload_requested = False
+
+    def bind(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(2048)
+        self.socket.set_inheritable(True)
+
+    def spawn(self, index):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            logger.info("Started worker %s (pid %s)", index, pid)
+            return pid
+        # Child: restore default signal handling and serve until told to stop.
+        # uvicorn re-raises the stop signal after draining; exiting through
+        # SystemExit (not the default action) lets the finally below run
+        for sig in (signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, _exit_worker)
+        os.environ["WORKER_INDEX"] = str(index)
+        # Exit hooks registered by the master (removing the metrics directory)
+        # are not the worker's to run
+        atexit._clear()
+        atexit.register(logging.shutdown)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            timeout_graceful_shutdown=self.graceful_timeout,
+            log_config=None,
+        )
+        try:
+            uvicorn.Server(config).run(sockets=[self.socket])
+        finally:
+            # os._exit skips atexit: run the worker's exit hooks (log queue
+            # listener, request recorder) so nothing buffered is lost
+            atexit._run_exitfuncs()
+            os._exit(0)
+
+    def stop_worker(self, pid):
+        # uvicorn stops accepting on SIGTERM and finishes in-flight requests
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def wait_for(self, pid, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                self.children.pop(pid, None)
+                return
+            time.sleep(0.05)
+        logger.warning("Worker pid %s did not drain in time, killing it", pid)
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        self.children.pop(pid, None)
+
+    def reload(self):
+        # Rolling restart: start the replacement first, then drain the old worker
+        for pid, index in list(self.children.items()):
+            self.spawn(index)
+            self.stop_worker(pid)
+            self.wait_for(pid, self.graceful_timeout + 5)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            index = self.children.pop(pid, None)
+            if index is not None and not self.stopping:
+                logger.warning("Worker %s (pid %s) exited with status %s, restarting", index, pid, status)
+                self.spawn(index)
+
+    def run(self):
+        self.bind()
+        configure_cache(self.workers)
+        created = self.prepare_metrics_dir()
+        try:
+            self.supervise()
+        finally:
+            # Only the master removes a directory it created, after every worker is gone
+            if created:
+                shutil.rmtree(created, ignore_errors=True)
+
+    def prepare_metrics_dir(self):
+# /metrics must add up every worker, so there is always a snapshot directory;
+# returns the directory when it was created here
+        metrics_dir = os.getenv("METRICS_DIR")
+        if metrics_dir:
+            # Start every run with empty per-worker metric snapshots
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+            os.makedirs(metrics_dir, exist_ok=True)
+            return None
+        metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+        return metrics_dir
+
+    def supervise(self):
+        for index in range(self.workers):
+            self.spawn(index)
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        logger.info("Serving %s on %s:%s with %s workers", self.app, self.host, self.port, self.workers)
+
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                logger.info("Reloading workers")
+                self.reload()
+            self.reap()
+            time.sleep(0.2)
+
+        for pid in list(self.children):
+            self.stop_worker(pid)
+        for pid in list(self.children):
+            self.wait_for(pid, self.graceful_timeout + 5)
+        self.socket.close()
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        self.reload_requested = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run main:app with one worker process per core")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    Master(args.app, args.host, args.port, args.workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
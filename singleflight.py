@@ -0,0 +1,40 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Deduplicates identical in-flight reads within one worker: the first caller
+# for a key starts the query and every caller that arrives while it runs
+# awaits the same task and gets the same result (or exception). Results are
+# shared, so callers must not mutate them.
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        # shield: a caller that disconnects must not cancel the query for the rest
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Coalesced query %s failed: %s", key, task.exception())
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionMiddleware, Limiter, Rejected, classify
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("GET", "/health/ready", "exempt"),
+    ("GET", "/metrics", "exempt"),
+    ("GET", "/students/oneStudentbyId/665f1c2e8a3b4c5d6e7f8091", "read"),
+    ("GET", "/students/Ana", "read"),
+    ("GET", "/courses/Curso 1", "read"),
+    ("GET", "/universities/Universidad 1", "read"),
+    ("GET", "/scientists/Ana Garcia", "read"),
+    ("HEAD", "/patents/Sensor optico 1", "read"),
+    ("GET", "/scientists/autocomplete", "read"),
+    ("GET", "/views/students_per_course/665f1c2e8a3b4c5d6e7f8091", "read"),
+    ("POST", "/students/batch-get", "read"),
+    ("GET", "/students", "scan"),
+    ("GET", "/scientists/search", "scan"),
+    ("GET", "/patents/export", "scan"),
+    ("GET", "/scientists/co-contributors", "scan"),
+    ("GET", "/courses/students", "scan"),
+    ("GET", "/universities/carreras", "scan"),
+    ("GET", "/courses/665f1c2e8a3b4c5d6e7f8091/students", "scan"),
+    ("POST", "/patents/query", "scan"),
+    ("POST", "/students", "write"),
+    ("PUT", "/students/updateStudent/665f1c2e8a3b4c5d6e7f8091", "write"),
+    ("DELETE", "/students/deleteStudent/665f1c2e8a3b4c5d6e7f8091", "write"),
+])
+def test_classify(method, path, expected):
+    assert classify(method, path) == expected
+
+
+def test_release_hands_the_token_to_the_oldest_waiter():
+    async def run():
+        limiter = Limiter("read", 1, 4, 1.0)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire())
+        second = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 2
+        limiter.release(0.01)
+        await first
+        assert not second.done()
+        assert limiter.active == 1
+        limiter.release(0.01)
+        await second
+        limiter.release(0.01)
+        assert limiter.active == 0
+        assert limiter.admitted == 3
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_rejected_right_away():
+    async def run():
+        limiter = Limiter("scan", 1, 1, 1.0)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected):
+            await limiter.acquire()
+        assert limiter.rejected == 1
+        waiter.cancel()
+
+    asyncio.run(run())
+
+
+def test_waiter_times_out():
+    async def run():
+        limiter = Limiter("write", 1, 4, 0.01)
+        await limiter.acquire()
+        with pytest.raises(Rejected):
+            await limiter.acquire()
+        assert limiter.timed_out == 1
+        assert limiter.stats()["queued"] == 0
+        limiter.release(0.0)
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_keep_a_token():
+    async def run():
+        limiter = Limiter("read", 1, 4, 1.0)
+        await limiter.acquire()
+        # Cancelled while queued: release skips it
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        # Cancelled after the token was handed over: it gives the token back
+        handed = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release(0.0)
+        handed.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await handed
+        assert limiter.active == 0
+        assert not limiter.waiters
+
+    asyncio.run(run())
+
+
+def test_middleware_sheds_with_503_and_retry_after():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def run():
+        limiter = Limiter("write", 1, 0, 1.0)
+        middleware = AdmissionMiddleware(app, {"write": limiter})
+        await limiter.acquire()
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "method": "POST", "path": "/students"}, None, send)
+        assert messages[0]["status"] == 503
+        assert (b"retry-after", b"1") in messages[0]["headers"]
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+from batching import InsertBatcher
+
+
+class FakeCollection:
+    # insert_many like pymongo: sets _id on every document, then reports
+    # per-document errors with BulkWriteError
+    name = "students"
+
+    def __init__(self, errors=None, failure=None):
+        self.errors = errors or {}  # name -> (code, errmsg)
+        self.failure = failure
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        assert not ordered
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        self.batches.append([doc["name"] for doc in docs])
+        if self.failure is not None:
+            raise self.failure
+        write_errors = [
+            {"index": index, "code": self.errors[doc["name"]][0], "errmsg": self.errors[doc["name"]][1]}
+            for index, doc in enumerate(docs) if doc["name"] in self.errors
+        ]
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors})
+
+
+def insert_all(batcher, names):
+    return asyncio.gather(*(batcher.insert({"name": name}) for name in names), return_exceptions=True)
+
+
+def test_flushes_when_max_docs_are_queued():
+    async def run():
+        collection = FakeCollection()
+        # A delay the test would never wait for: only the size can flush
+        batcher = InsertBatcher(collection, max_docs=3, max_delay=60)
+        ids = await asyncio.wait_for(insert_all(batcher, "abc"), 1)
+        assert collection.batches == [["a", "b", "c"]]
+        assert len(set(ids)) == 3 and all(isinstance(id, ObjectId) for id in ids)
+        assert batcher.stats() == {"queued": 0, "batches": 1, "documents": 3}
+
+    asyncio.run(run())
+
+
+def test_flushes_after_max_delay():
+    async def run():
+        collection = FakeCollection()
+        batcher = InsertBatcher(collection, max_docs=100, max_delay=0.01)
+        first = await insert_all(batcher, "ab")
+        second = await insert_all(batcher, "c")
+        assert collection.batches == [["a", "b"], ["c"]]
+        assert len(set(first + second)) == 3
+
+    asyncio.run(run())
+
+
+def test_each_caller_gets_its_own_error():
+    async def run():
+        collection = FakeCollection(errors={"b": (11000, "duplicate key"), "c": (121, "validation failed")})
+        batcher = InsertBatcher(collection, max_docs=4)
+        a, b, c, d = await insert_all(batcher, "abcd")
+        assert isinstance(a, ObjectId) and isinstance(d, ObjectId)
+        assert isinstance(b, DuplicateKeyError)
+        assert isinstance(c, WriteError) and not isinstance(c, DuplicateKeyError)
+        assert c.code == 121
+
+    asyncio.run(run())
+
+
+def test_whole_batch_failure_reaches_every_caller():
+    async def run():
+        failure = ConnectionError("no primary")
+        batcher = InsertBatcher(FakeCollection(failure=failure), max_docs=3)
+        assert await insert_all(batcher, "abc") == [failure] * 3
+
+    asyncio.run(run())
+
+
+def test_close_writes_what_is_queued():
+    async def run():
+        collection = FakeCollection()
+        batcher = InsertBatcher(collection, max_docs=100, max_delay=60)
+        inserts = insert_all(batcher, "ab")
+        await asyncio.sleep(0)
+        assert batcher.stats()["queued"] == 2
+        await batcher.close()
+        assert collection.batches == [["a", "b"]]
+        assert all(isinstance(id, ObjectId) for id in await inserts)
+
+    asyncio.run(run())
+
+
+def test_close_with_nothing_queued():
+    asyncio.run(InsertBatcher(FakeCollection()).close())
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from cache import LocalCache, MemoryRedis, RedisCache
+
+
+def backends():
+    return [LocalCache(ttl=60.0), RedisCache(ttl=60.0, client=MemoryRedis())]
+
+
+@pytest.mark.parametrize("cache", backends())
+def test_read_through_and_invalidate(cache):
+    async def run():
+        key = ("students", "a")
+        assert await cache.get(key) is None
+        await cache.set(key, {"_id": "a", "version": 1}, await cache.generation(key))
+        assert await cache.get(key) == {"_id": "a", "version": 1}
+        await cache.delete(key)
+        assert await cache.get(key) is None
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("cache", backends())
+def test_fill_after_invalidation_is_refused(cache):
+    async def run():
+        key = ("students", "a")
+        # A reader takes the generation and goes to Mongo...
+        generation = await cache.generation(key)
+        # ...a write invalidates the key meanwhile...
+        await cache.delete(key)
+        # ...and the pre-write document the reader got must not be cached
+        await cache.set(key, {"_id": "a", "version": 1}, generation)
+        assert await cache.get(key) is None
+        assert cache.stats()["stale_fills"] == 1
+        # A reader that started after the write fills normally
+        await cache.set(key, {"_id": "a", "version": 2}, await cache.generation(key))
+        assert await cache.get(key) == {"_id": "a", "version": 2}
+
+    asyncio.run(run())
+
+
+def test_invalidation_between_check_and_write_removes_entry():
+    async def run():
+        redis = MemoryRedis()
+        cache = RedisCache(ttl=60.0, client=redis)
+        key = ("students", "a")
+        generation = await cache.generation(key)
+        original_set = redis.set
+
+        async def set_then_invalidate(*args, **kwargs):
+            await original_set(*args, **kwargs)
+            await redis.incr(cache._generation_key(key))
+
+        redis.set = set_then_invalidate
+        await cache.set(key, {"_id": "a"}, generation)
+        assert await cache.get(key) is None
+
+    asyncio.run(run())
+
+
+def test_local_cache_is_bounded():
+    async def run():
+        cache = LocalCache(max_entries=2, ttl=60.0)
+        for id in "abc":
+            await cache.set(("students", id), {"_id": id})
+        assert await cache.get(("students", "a")) is None
+        assert cache.stats()["evictions"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,82 @@
+import asyncio
+import gzip
+
+from compression import CompressionMiddleware, choose_encoding
+
+
+def app_sending(status, body_chunks, content_type=b"application/json"):
+    async def app(scope, receive, send):
+        headers = [(b"etag", b'"3"')]
+        if status != 304:
+            headers.append((b"content-type", content_type))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        for i, chunk in enumerate(body_chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(body_chunks) - 1})
+    return app
+
+
+def call(app, accept=b"gzip", minimum_size=100):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept)] if accept else []}
+    asyncio.run(CompressionMiddleware(app, minimum_size=minimum_size, encodings=["gzip"])(scope, None, send))
+    start = messages[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def test_small_response_is_not_compressed_but_varies():
+    status, headers, body = call(app_sending(200, [b'{"a":1}']))
+    assert body == b'{"a":1}'
+    assert b"content-encoding" not in headers
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert headers[b"etag"] == b'W/"3"'
+
+
+def test_large_response_is_compressed():
+    payload = b'{"a":"' + b"x" * 500 + b'"}'
+    status, headers, body = call(app_sending(200, [payload]))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"content-length"] == str(len(body)).encode()
+    assert headers[b"etag"] == b'W/"3"'
+    assert gzip.decompress(body) == payload
+
+
+def test_streamed_response_is_compressed_per_chunk():
+    chunks = [b'{"a":1}\n', b'{"a":2}\n', b""]
+    status, headers, body = call(app_sending(200, chunks, b"application/x-ndjson"))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    assert gzip.decompress(body) == b"".join(chunks)
+
+
+def test_not_modified_matches_the_full_response():
+    small = call(app_sending(200, [b'{"a":1}']))[1]
+    large = call(app_sending(200, [b"x" * 500]))[1]
+    status, headers, body = call(app_sending(304, [b""]))
+    assert status == 304
+    assert body == b""
+    assert headers[b"etag"] == small[b"etag"] == large[b"etag"]
+    assert headers[b"vary"] == b"Accept-Encoding"
+
+
+def test_identity_keeps_strong_etag():
+    for status, chunks in ((200, [b"x" * 500]), (304, [b""])):
+        _, headers, _ = call(app_sending(status, chunks), accept=None)
+        assert headers[b"etag"] == b'"3"'
+        assert headers[b"vary"] == b"Accept-Encoding"
+
+
+def test_other_media_types_pass_through():
+    status, headers, body = call(app_sending(200, [b"x" * 500], b"image/png"))
+    assert body == b"x" * 500
+    assert headers[b"etag"] == b'"3"'
+    assert b"vary" not in headers
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip;q=0.5, br", ["zstd", "br", "gzip"]) == "br"
+    assert choose_encoding("gzip;q=0", ["gzip"]) is None
+    assert choose_encoding("*", ["zstd", "gzip"]) == "zstd"
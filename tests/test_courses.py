@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import bson
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import main
+from cache import LocalCache
+
+COURSE = {"name": "Curso 1", "facultad": "Ciencias", "alumnos": [{"name": "Ana", "age": 20}]}
+
+
+class FakeCourses:
+    # Encodes what it is given the way the driver would, so values bson
+    # cannot store fail here too
+    def __init__(self):
+        self.written = []
+
+    async def insert_one(self, doc):
+        self.written.append(bson.decode(bson.encode(doc)))
+        return SimpleNamespace(inserted_id=ObjectId())
+
+    async def update_one(self, filter, update):
+        self.written.append(bson.decode(bson.encode(update)))
+        return SimpleNamespace(matched_count=1)
+
+
+def client(monkeypatch):
+    courses = FakeCourses()
+    monkeypatch.setattr(main, "db", SimpleNamespace(courses=courses))
+    monkeypatch.setattr(main, "cache", LocalCache())
+    return TestClient(main.app), courses
+
+
+def test_create_course_stores_students_as_documents(monkeypatch):
+    http, courses = client(monkeypatch)
+    assert http.post("/courses", json=COURSE).status_code == 200
+    assert courses.written[0]["alumnos"] == COURSE["alumnos"]
+
+
+def test_update_course_stores_students_as_documents(monkeypatch):
+    http, courses = client(monkeypatch)
+    assert http.put(f"/courses/updateCourse/{ObjectId()}", json=COURSE).status_code == 200
+    assert courses.written[0]["$set"]["alumnos"] == COURSE["alumnos"]
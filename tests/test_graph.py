@@ -0,0 +1,76 @@
+import asyncio
+
+import main
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class FakePatents:
+    # Only what co_contributors asks for: $in on contributors with a limit
+    def __init__(self, teams):
+        self.docs = [{"contributors": team} for team in teams]
+        self.queries = 0
+
+    def find(self, filter, fields=None, sort=None, limit=0):
+        self.queries += 1
+        names = set(filter["contributors"]["$in"])
+        docs = [dict(doc) for doc in self.docs if names & set(doc["contributors"])]
+        return FakeCursor(docs[:limit] if limit else docs)
+
+
+def run(monkeypatch, teams, name, depth, limit=100):
+    patents = FakePatents(teams)
+    monkeypatch.setattr(main, "db", {"patents": patents})
+    return asyncio.run(main.co_contributors(name, depth, limit)), patents
+
+
+def test_hops_follow_the_shortest_path(monkeypatch):
+    teams = [["A", "B"], ["A", "B", "C"], ["C", "D"], ["D", "E"], ["E", "F"]]
+    result, patents = run(monkeypatch, teams, "A", 3)
+    assert result["co_contributors"] == [
+        {"name": "B", "hops": 1, "shared_patents": 2},
+        {"name": "C", "hops": 1, "shared_patents": 1},
+        {"name": "D", "hops": 2},
+        {"name": "E", "hops": 3},
+    ]
+    assert not result["truncated"]
+    assert patents.queries == 3
+
+
+def test_unknown_contributor(monkeypatch):
+    result, _ = run(monkeypatch, [["A", "B"]], "Z", 2)
+    assert result is None
+
+
+def test_traversal_stops_when_nothing_new_is_reached(monkeypatch):
+    result, patents = run(monkeypatch, [["A", "B"]], "A", 3)
+    assert [node["name"] for node in result["co_contributors"]] == ["B"]
+    assert patents.queries == 2
+
+
+def test_frontier_cap_marks_truncated(monkeypatch):
+    monkeypatch.setattr(main, "MAX_GRAPH_FRONTIER", 2)
+    teams = [["A", "B", "C", "D"], ["D", "X"], ["B", "Y"]]
+    result, _ = run(monkeypatch, teams, "A", 2)
+    # D is past the cap, so X is not reached
+    assert [node["name"] for node in result["co_contributors"]] == ["B", "C", "D", "Y"]
+    assert result["truncated"]
+
+
+def test_patents_per_hop_cap_marks_truncated(monkeypatch):
+    monkeypatch.setattr(main, "MAX_HOP_PATENTS", 2)
+    teams = [["A", "B"], ["B", "C"], ["B", "D"], ["B", "E"]]
+    result, _ = run(monkeypatch, teams, "A", 2)
+    assert result["truncated"]
+
+
+def test_limit_marks_truncated(monkeypatch):
+    result, _ = run(monkeypatch, [["A", "B", "C", "D"]], "A", 1, limit=2)
+    assert [node["name"] for node in result["co_contributors"]] == ["B", "C"]
+    assert result["truncated"]
@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+# Without the lifespan there is no database: a malformed id must be
+# rejected before any query is sent
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("GET", "/students/oneStudentbyId/not-an-id", None),
+    ("GET", "/courses/oneCourse/not-an-id", None),
+    ("GET", "/universities/oneUniversity/not-an-id", None),
+    ("GET", "/scientists/oneScientist/not-an-id", None),
+    ("GET", "/patents/onePatent/not-an-id", None),
+    ("GET", "/students/oneStudentbyId/not-an-id?fields=name", None),
+    ("DELETE", "/students/deleteStudent/not-an-id", None),
+    ("DELETE", "/courses/deleteCourse/not-an-id", None),
+    ("DELETE", "/universities/deleteUniversity/not-an-id", None),
+    ("DELETE", "/scientists/deleteScientist/not-an-id", None),
+    ("DELETE", "/patents/deletePatent/not-an-id", None),
+    ("PUT", "/courses/not-an-id/add_student_ids", []),
+    ("PUT", "/universities/not-an-id/add", []),
+    ("PUT", "/universities/665f1c2e8a3b4c5d6e7f8091/add", ["not-an-id"]),
+])
+def test_malformed_id_is_rejected(method, path, body):
+    response = client.request(method, path, json=body)
+    assert response.status_code == 400
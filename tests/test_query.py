@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+import main
+from main import NAME_COLLATION, Patents, QueryFilter, QueryRequest, Scientists, Student, compile_filter, sort_is_indexed
+
+
+def conditions(*items):
+    return [QueryFilter(field=field, op=op, value=value) for field, op, value in items]
+
+
+def test_compile_filter_merges_conditions_per_field():
+    query = compile_filter(Student, conditions(("age", "gte", 20), ("age", "lt", 23), ("name", "in", ["Ana", "Leo"])))
+    assert query == {"age": {"$gte": 20, "$lt": 23}, "name": {"$in": ["Ana", "Leo"]}}
+
+
+def test_compile_filter_converts_ids_and_list_fields():
+    oid = ObjectId()
+    assert compile_filter(Student, conditions(("_id", "eq", str(oid)))) == {"_id": {"$eq": oid}}
+    # Conditions on list fields apply to their elements
+    assert compile_filter(Scientists, conditions(("universities", "eq", "U1"))) == {"universities": {"$eq": "U1"}}
+
+
+@pytest.mark.parametrize("items", [
+    [("age", "eq", True)],
+    [("age", "eq", "20")],
+    [("_id", "eq", "not-an-id")],
+    [("missing", "eq", 1)],
+    [("age", "in", 20)],
+    [("age", "gt", 1), ("age", "gt", 2)],
+])
+def test_compile_filter_rejects_bad_conditions(items):
+    with pytest.raises(HTTPException) as e:
+        compile_filter(Student, conditions(*items))
+    assert e.value.status_code == 400
+
+
+def test_sort_on_id_and_single_field_index_in_both_directions():
+    assert sort_is_indexed("students", [], set())
+    assert sort_is_indexed("students", [("_id", DESCENDING)], set())
+    assert sort_is_indexed("students", [("age", ASCENDING)], set())
+    assert sort_is_indexed("students", [("age", DESCENDING)], set())
+    assert not sort_is_indexed("courses", [("facultad", ASCENDING)], set())
+
+
+def test_compound_sort_must_match_all_or_no_directions():
+    assert sort_is_indexed("students", [("name", ASCENDING), ("_id", ASCENDING)], set())
+    assert sort_is_indexed("students", [("name", DESCENDING), ("_id", DESCENDING)], set())
+    assert not sort_is_indexed("students", [("name", ASCENDING), ("_id", DESCENDING)], set())
+    assert not sort_is_indexed("students", [("_id", ASCENDING), ("name", ASCENDING)], set())
+
+
+def test_equality_prefix_is_skipped(monkeypatch):
+    monkeypatch.setitem(main.INDEXES, "things", [IndexModel([("a", ASCENDING), ("b", DESCENDING)])])
+    assert sort_is_indexed("things", [("b", DESCENDING)], {"a"})
+    assert sort_is_indexed("things", [("b", ASCENDING)], {"a"})
+    assert not sort_is_indexed("things", [("b", DESCENDING)], set())
+    # A field that is both fixed and sorted on is not skipped
+    assert sort_is_indexed("things", [("a", ASCENDING), ("b", DESCENDING)], {"a"})
+    assert not sort_is_indexed("things", [("a", ASCENDING), ("b", ASCENDING)], set())
+
+
+def test_collated_and_text_indexes_do_not_serve_sorts(monkeypatch):
+    monkeypatch.setitem(main.INDEXES, "things", [
+        IndexModel([("c", ASCENDING)], collation=NAME_COLLATION),
+        IndexModel([("t", TEXT)]),
+    ])
+    assert not sort_is_indexed("things", [("c", ASCENDING)], set())
+    assert not sort_is_indexed("things", [("t", ASCENDING)], set())
+
+
+@pytest.mark.parametrize("collection, model, field", [
+    ("patents", Patents, "contributors"),
+    ("scientists", Scientists, "universities"),
+])
+def test_sort_on_list_field_is_rejected(collection, model, field):
+    # Both fields have a (multikey) index, which cannot sort without a SORT stage
+    request = QueryRequest(sort=[{"field": field}])
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main.typed_query(collection, model, request))
+    assert e.value.status_code == 400
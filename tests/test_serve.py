@@ -0,0 +1,58 @@
+import atexit
+import os
+import shutil
+import time
+import urllib.request
+
+from serve import Master
+
+
+def touch(path):
+    open(path, "w").close()
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Like the log listener and the recorder, a hook the worker registers itself
+                atexit.register(touch, os.path.join(os.environ["METRICS_DIR"], "worker-exited"))
+            await send({"type": f"{message['type']}.complete"})
+            if message["type"] == "lifespan.shutdown":
+                return
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def wait_until_serving(port):
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            return urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def test_worker_exit_runs_its_hooks_and_keeps_metrics_dir(monkeypatch):
+    monkeypatch.delenv("METRICS_DIR", raising=False)
+    master = Master(app, "127.0.0.1", 0, 1, 1)
+    master.bind()
+    created = master.prepare_metrics_dir()
+    # A cleanup hook held by the master must not run when a worker exits
+    atexit.register(shutil.rmtree, created, ignore_errors=True)
+    try:
+        pid = master.spawn(0)
+        assert wait_until_serving(master.socket.getsockname()[1]) == b"ok"
+        master.stop_worker(pid)
+        master.wait_for(pid, 10)
+        assert pid not in master.children
+        assert os.path.isdir(created)
+        assert os.path.exists(os.path.join(created, "worker-exited"))
+        assert os.environ["METRICS_DIR"] == created
+    finally:
+        atexit.unregister(shutil.rmtree)
+        master.socket.close()
+        shutil.rmtree(created, ignore_errors=True)
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_followers_share_the_leader_result():
+    async def run():
+        flights = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def query():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"_id": 1}
+
+        waiting = [asyncio.create_task(flights.do("k", query)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flights.stats() == {"in_flight": 1, "leaders": 1, "coalesced": 2}
+        release.set()
+        results = await asyncio.gather(*waiting)
+        assert calls == 1
+        assert results[0] is results[1] is results[2]
+        assert flights.stats()["in_flight"] == 0
+        # A later call starts a new query
+        assert await flights.do("k", query) == {"_id": 1}
+        assert calls == 2 and flights.leaders == 2
+
+    asyncio.run(run())
+
+
+def test_different_keys_do_not_share():
+    async def run():
+        flights = SingleFlight()
+
+        async def query(value):
+            await asyncio.sleep(0)
+            return value
+
+        assert await asyncio.gather(flights.do("a", lambda: query(1)), flights.do("b", lambda: query(2))) == [1, 2]
+        assert flights.coalesced == 0
+
+    asyncio.run(run())
+
+
+def test_errors_reach_every_caller():
+    async def run():
+        flights = SingleFlight()
+
+        async def query():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flights.do("k", query), flights.do("k", query), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_cancelling_a_caller_does_not_cancel_the_query():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def query():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flights.do("k", query))
+        followers = [asyncio.create_task(flights.do("k", query)) for _ in range(2)]
+        await asyncio.sleep(0)
+        # Neither a follower nor the caller that started the query cancels it
+        for caller in (followers[0], leader):
+            caller.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+        release.set()
+        assert await followers[1] == "done"
+
+    asyncio.run(run())
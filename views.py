@@ -0,0 +1,183 @@
+import re
+import asyncio
+import logging
+import datetime
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Collection that stores the change stream resume token
+STATE_COLLECTION = "mv_state"
+STATE_ID = "change_stream"
+
+
+def _year_filter(year):
+    # Undated patents (missing, null or empty date) share the "" row
+    if not year:
+        return {"date": {"$in": [None, ""]}}
+    # Anchored prefix regex on date: resolved with a bounded scan of the date index
+    return {"date": {"$regex": f"^{re.escape(year)}"}}
+
+
+# Materialized views. Each one aggregates its source collection into a
+# target collection keyed by _id; key_of tells which view row a source
+# document contributes to, and match_for selects the source documents of
+# one row so it can be recomputed on its own. Per-document views have one
+# row per source document, keyed by the same _id.
+VIEWS = {
+    "students_per_course": {
+        "source": "courses",
+        "target": "mv_students_per_course",
+        "pipeline": [
+            {"$project": {"name": 1, "students": {"$size": {"$ifNull": ["$alumnos", []]}}}},
+        ],
+        "per_document": True,
+        "key_of": lambda doc: doc["_id"],
+        "match_for": lambda key: {"_id": key},
+    },
+    "careers_per_university": {
+        "source": "universities",
+        "target": "mv_careers_per_university",
+        "pipeline": [
+            {"$project": {"name": 1, "careers": {"$size": {"$ifNull": ["$carreras", []]}}}},
+        ],
+        "per_document": True,
+        "key_of": lambda doc: doc["_id"],
+        "match_for": lambda key: {"_id": key},
+    },
+    "scientists_per_field": {
+        "source": "scientists",
+        "target": "mv_scientists_per_field",
+        "pipeline": [{"$group": {"_id": "$cneaiField", "scientists": {"$sum": 1}}}],
+        "key_of": lambda doc: doc.get("cneaiField"),
+        "match_for": lambda key: {"cneaiField": key},
+    },
+    "scientists_per_category": {
+        "source": "scientists",
+        "target": "mv_scientists_per_category",
+        "pipeline": [{"$group": {"_id": "$category", "scientists": {"$sum": 1}}}],
+        "key_of": lambda doc: doc.get("category"),
+        "match_for": lambda key: {"category": key},
+    },
+    "patents_per_year": {
+        "source": "patents",
+        "target": "mv_patents_per_year",
+        "pipeline": [
+            {"$group": {"_id": {"$substrCP": [{"$ifNull": ["$date", ""]}, 0, 4]}, "patents": {"$sum": 1}}},
+        ],
+        "key_of": lambda doc: (doc.get("date") or "")[:4],
+        "match_for": _year_filter,
+    },
+}
+
+
+async def _merge(db, view, match, refreshed_at):
+    # Recompute the rows of the source documents selected by match and merge them
+    pipeline = [
+        *([{"$match": match}] if match is not None else []),
+        *view["pipeline"],
+        {"$set": {"refreshed_at": refreshed_at}},
+        {"$merge": {"into": view["target"], "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    cursor = await db[view["source"]].aggregate(pipeline)
+    await cursor.to_list(None)
+
+
+async def rebuild(db, name):
+# Full recompute of one view; rows that no longer exist are removed afterwards
+    view = VIEWS[name]
+    refreshed_at = datetime.datetime.now(datetime.timezone.utc)
+    await _merge(db, view, None, refreshed_at)
+    await db[view["target"]].delete_many({"refreshed_at": {"$lt": refreshed_at}})
+    logger.info("Materialized view %s rebuilt", name)
+
+
+async def refresh_keys(db, name, keys):
+# Recompute only the given rows of one view
+    view = VIEWS[name]
+    for key in keys:
+        refreshed_at = datetime.datetime.now(datetime.timezone.utc)
+        await _merge(db, view, view["match_for"](key), refreshed_at)
+        # The row disappears when no source document contributes to it anymore
+        await db[view["target"]].delete_many({"_id": key, "refreshed_at": {"$lt": refreshed_at}})
+
+
+async def enable_pre_images(db):
+# Ask for pre-images so updates and deletes can refresh the row they leave;
+# returns False when the server does not support them (MongoDB < 6.0)
+    enabled = True
+    for source in {view["source"] for view in VIEWS.values()}:
+        try:
+            if source not in await db.list_collection_names(filter={"name": source}):
+                await db.create_collection(source)
+            await db.command("collMod", source, changeStreamPreAndPostImages={"enabled": True})
+        except OperationFailure as e:
+            logger.warning("Pre-images not available on %s, grouped views fall back to rebuilds: %s", source, e)
+            enabled = False
+    return enabled
+
+
+async def apply_change(db, change):
+# Refresh the view rows touched by one change stream event
+    source = change.get("ns", {}).get("coll")
+    after = change.get("fullDocument")
+    before = change.get("fullDocumentBeforeChange")
+    for name, view in VIEWS.items():
+        if view["source"] != source:
+            continue
+        if "documentKey" not in change:
+            # drop, rename and similar events: recompute the whole view
+            await rebuild(db, name)
+            continue
+        document_id = change["documentKey"]["_id"]
+        keys = set()
+        if after is not None:
+            keys.add(view["key_of"](after))
+        if before is not None:
+            keys.add(view["key_of"](before))
+        elif change["operationType"] in ("update", "replace", "delete"):
+            if view.get("per_document"):
+                keys.add(document_id)
+            else:
+                # Without the pre-image the row the document left is unknown
+                await rebuild(db, name)
+                continue
+        await refresh_keys(db, name, keys)
+
+
+async def maintain(db, retry_delay=5.0):
+# Keep every view current from a database change stream; resumes after restarts
+    # Older servers reject fullDocumentBeforeChange, so only ask for it when
+    # pre-images could be enabled; without them apply_change rebuilds instead
+    pre_images = await enable_pre_images(db)
+    watch_options = {"full_document_before_change": "whenAvailable"} if pre_images else {}
+    state = db[STATE_COLLECTION]
+    sources = sorted({view["source"] for view in VIEWS.values()})
+    while True:
+        try:
+            saved = await state.find_one({"_id": STATE_ID})
+            token = saved["token"] if saved else None
+            # Open the stream before any rebuild so no change in between is missed
+            stream = await db.watch(
+                [{"$match": {"ns.coll": {"$in": sources}}}],
+                full_document="updateLookup",
+                resume_after=token,
+                **watch_options,
+            )
+            async with stream:
+                if token is None:
+                    for name in VIEWS:
+                        await rebuild(db, name)
+                logger.info("Watching changes for materialized views")
+                async for change in stream:
+                    await apply_change(db, change)
+                    await state.replace_one({"_id": STATE_ID}, {"token": stream.resume_token}, upsert=True)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            logger.error("Materialized view maintenance failed, retrying: %s", e)
+            if isinstance(e, OperationFailure) and e.code == 286:
+                # ChangeStreamHistoryLost: the token is too old, start from a rebuild
+                await state.delete_one({"_id": STATE_ID})
+            await asyncio.sleep(retry_delay)